@@ -1,7 +1,29 @@
 import cv2
 import os
+import time
+import argparse
 import numpy as np
-from sklearn.model_selection import train_test_split
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from FaceModels import MODEL_PATHS, CONFIG_PATH, crear_reconocedor, guardar_nombres
+from EmbeddingRecognizer import EmbeddingRecognizer, SFACE_MODEL
+from UniformLBPH import tabla_uniforme
+
+# Parámetros LBPH del modelo final (también usados en la evaluación)
+LBPH_PARAMS = dict(
+    radius=2,          # Más preciso
+    neighbors=16,      # Más vecinos para mejor precisión
+    grid_x=8,          # Mayor resolución
+    grid_y=8,
+)
+
+# Tasa de falsas aceptaciones objetivo para elegir el umbral
+FAR_OBJETIVO = 0.01
+
+# Dataset compartido por cada proceso de evaluación (se envía una sola vez)
+_eval_faces = None
+_eval_labels = None
 
 def verificar_calidad_imagenes():
     """Verificar y filtrar imágenes de mala calidad"""
@@ -48,14 +70,15 @@ def verificar_calidad_imagenes():
     
     print(f"🗑️ Total de imágenes de mala calidad eliminadas: {total_removed}")
 
-def obtenerModelo():
-    """Obtener datos de entrenamiento con validación"""
+def obtenerModelo(color=False):
+    """Obtener datos de entrenamiento con validación (en color para embeddings)"""
     dataPath = 'Data'
     peopleList = os.listdir(dataPath)
     print('🎯 Personas en base de datos:', peopleList)
     
     labels = []
     facesData = []
+    nombres = []  # nombres[label]: se guardan con el modelo
     label = 0
     
     for nameDir in peopleList:
@@ -75,25 +98,215 @@ def obtenerModelo():
         
         for fileName in images:
             img_path = os.path.join(personPath, fileName)
-            img = cv2.imread(img_path, 0)
+            img = cv2.imread(img_path, cv2.IMREAD_COLOR if color else cv2.IMREAD_GRAYSCALE)
             
             if img is not None:
                 # Redimensionar todas las imágenes al mismo tamaño
                 img_resized = cv2.resize(img, (150, 150), interpolation=cv2.INTER_CUBIC)
                 
-                # Normalizar la imagen
-                img_normalized = cv2.equalizeHist(img_resized)
+                # Normalizar la imagen (SFace usa el color tal cual, como en la puerta)
+                img_normalized = img_resized if color else cv2.equalizeHist(img_resized)
                 
                 person_faces.append(img_normalized)
                 labels.append(label)
         
         facesData.extend(person_faces)
         print(f"  ✅ {len(person_faces)} imágenes procesadas para {nameDir}")
+        nombres.append(nameDir)
         label += 1
     
-    return facesData, labels
+    return facesData, labels, nombres
+
+def dividir_holdout(faces, labels):
+    """División 80/20 estratificada de referencia para comparar modelos"""
+    return train_test_split(
+        faces, labels, test_size=0.2, random_state=42, stratify=labels
+    )
+
+def _iniciar_worker(faces, labels):
+    """Guardar el dataset en el proceso de evaluación"""
+    global _eval_faces, _eval_labels
+    _eval_faces = faces
+    _eval_labels = labels
+
+def memoria_disponible():
+    """Bytes de RAM disponibles (MemAvailable en Linux); None si no se puede saber"""
+    try:
+        with open('/proc/meminfo') as f:
+            for linea in f:
+                if linea.startswith('MemAvailable:'):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        # macOS no tiene SC_AVPHYS_PAGES y Windows no tiene os.sysconf
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def procesos_por_memoria(bytes_por_proceso, maximo):
+    """Cuántos procesos (hasta maximo) caben en el 80% de la RAM libre; sin límite si no se sabe"""
+    disponible = memoria_disponible()
+    if disponible is None:
+        return maximo
+    return max(1, min(maximo, int(disponible * 0.8) // max(1, bytes_por_proceso)))
+
+def bytes_por_imagen(tipo, params):
+    """Tamaño en RAM del vector que cada reconocedor guarda por imagen de la galería"""
+    if tipo == 'embedding':
+        return 128 * 4
+    if tipo == 'uniform_lbph':
+        _, n_bins = tabla_uniforme(params.get('neighbors', 16), params.get('rotation_invariant', False))
+    else:
+        n_bins = 2 ** params.get('neighbors', 8)
+    return params.get('grid_x', 8) * params.get('grid_y', 8) * n_bins * 4
+
+def _distancias_galeria(recognizer, face):
+    """Etiqueta y distancia de un rostro a cada imagen de la galería"""
+    if isinstance(recognizer, cv2.face.LBPHFaceRecognizer):
+        collector = cv2.face.StandardCollector_create()
+        recognizer.predict_collect(face, collector)
+        resultados = np.array(collector.getResults(), dtype=np.float64).reshape(-1, 2)
+        return resultados[:, 0].astype(np.int32), resultados[:, 1]
+    return recognizer.getLabels(), recognizer.distancias(face)
+
+def _resumir(labels_galeria, dist, etiqueta):
+    """Vecino más cercano y distancia al impostor más cercano (otra persona)"""
+    i = int(np.argmin(dist))
+    otras = labels_galeria != etiqueta
+    impostor = float(dist[otras].min()) if otras.any() else np.inf
+    return labels_galeria[i], dist[i], impostor
+
+def _predecir_en_hilos(recognizer, faces, labels, hilos):
+    """Predecir varias caras repartidas en hilos (OpenCV libera el GIL)"""
+    y_pred = np.empty(len(faces), dtype=np.int32)
+    dist = np.empty(len(faces), dtype=np.float64)
+    impostor = np.empty(len(faces), dtype=np.float64)
+
+    def predecir_bloque(bloque):
+        for i in bloque:
+            y_pred[i], dist[i], impostor[i] = _resumir(*_distancias_galeria(recognizer, faces[i]),
+                                                       labels[i])
+
+    bloques = np.array_split(np.arange(len(faces)), max(1, hilos))
+    if hilos > 1:
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            list(pool.map(predecir_bloque, bloques))
+    else:
+        predecir_bloque(bloques[0])
+    return y_pred, dist, impostor
+
+def _predecir_embeddings(recognizer, faces, labels):
+    """Predecir en lotes de 64 contra todos los embeddings de la galería"""
+    y_pred = np.empty(len(faces), dtype=np.int32)
+    dist = np.empty(len(faces), dtype=np.float64)
+    impostor = np.empty(len(faces), dtype=np.float64)
+    galeria = recognizer.getHistograms()
+    labels_galeria = recognizer.getLabels()
+    for inicio in range(0, len(faces), 64):
+        distancias = 1.0 - recognizer.embed(list(faces[inicio:inicio + 64])) @ galeria.T
+        for j, d in enumerate(distancias, inicio):
+            y_pred[j], dist[j], impostor[j] = _resumir(labels_galeria, d, labels[j])
+    return y_pred, dist, impostor
+
+def predecir_con_impostores(recognizer, faces, labels, hilos=1):
+    """Predicción, distancia y distancia al impostor más cercano de cada prueba"""
+    # La distancia a la imagen más cercana de otra persona es la que obtendría
+    # la prueba si no estuviera registrada: con ella se mide la FAR
+    if isinstance(recognizer, EmbeddingRecognizer):
+        # La red no se comparte entre hilos: los embeddings se calculan en lote
+        return _predecir_embeddings(recognizer, faces, labels)
+    return _predecir_en_hilos(recognizer, faces, labels, hilos)
+
+def _evaluar_fold(tarea):
+    """Entrenar y evaluar un fold; devuelve real, predicha, distancia y distancia de impostor"""
+    train_idx, test_idx, tipo, params, hilos = tarea
+
+    t0 = time.perf_counter()
+    recognizer = crear_reconocedor(tipo, **params)
+    recognizer.train(list(_eval_faces[train_idx]), _eval_labels[train_idx])
+    t_train = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    y_true = _eval_labels[test_idx]
+    y_pred, dist, impostor = predecir_con_impostores(recognizer, _eval_faces[test_idx], y_true, hilos)
+    t_predict = time.perf_counter() - t0
+
+    return y_true, y_pred, dist, impostor, t_train, t_predict
+
+def evaluar_kfold(faces, labels, params=LBPH_PARAMS, k=5, max_workers=None, tipo='lbph'):
+    """Validación cruzada k-fold con un proceso por fold"""
+    faces = np.asarray(faces, dtype=np.uint8)
+    labels = np.asarray(labels, dtype=np.int32)
+
+    # No puede haber más folds que imágenes de la persona con menos fotos
+    k = max(2, min(k, np.bincount(labels).min()))
+    skf = StratifiedKFold(n_splits=k, shuffle=True, random_state=42)
+
+    # Cada proceso guarda un modelo entero: no lanzar más de los que caben en RAM
+    cores = os.cpu_count() or 1
+    workers = max_workers
+    if workers is None:
+        por_fold = bytes_por_imagen(tipo, params) * len(faces) * (k - 1) // k + faces.nbytes
+        workers = procesos_por_memoria(por_fold, min(k, cores))
+        if workers < min(k, cores):
+            print(f"   • {workers} proceso(s) por memoria (~{por_fold / 1e6:.0f} MB por fold)")
+    hilos = max(1, cores // workers)
+    tareas = [(train_idx, test_idx, tipo, params, hilos) for train_idx, test_idx in skf.split(faces, labels)]
 
-def entrenar_modelo_avanzado():
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                             initargs=(faces, labels)) as pool:
+        resultados = list(pool.map(_evaluar_fold, tareas))
+    wall = time.perf_counter() - t0
+
+    y_true, y_pred, dist, impostor, t_train, t_predict = zip(*resultados)
+    return {
+        'y_true': np.concatenate(y_true),
+        'y_pred': np.concatenate(y_pred),
+        'dist': np.concatenate(dist),
+        'impostor': np.concatenate(impostor),
+        'folds': k,
+        'workers': workers,
+        'train_seconds': float(np.sum(t_train)),
+        'predict_seconds': float(np.sum(t_predict)),
+        'wall_seconds': wall,
+    }
+
+def barrido_umbral(y_true, y_pred, dist, impostor, far_objetivo=FAR_OBJETIVO):
+    """Curvas completas de aceptación/rechazo y umbral para la FAR objetivo"""
+    # Genuinas: pruebas bien identificadas; las mal identificadas se rechazan con cualquier umbral
+    correcto = np.asarray(y_pred) == np.asarray(y_true)
+    genuinas = np.where(correcto, np.asarray(dist, dtype=np.float64), np.inf)
+    # Impostoras: distancia de cada prueba a la persona más cercana que no es ella
+    impostor = np.asarray(impostor, dtype=np.float64)
+    impostor = np.sort(impostor[np.isfinite(impostor)])
+
+    # Con "distancia < t" se acepta: un punto de la curva en cada distancia observada
+    umbrales = np.unique(np.concatenate([genuinas[np.isfinite(genuinas)], impostor]))
+    far = np.searchsorted(impostor, umbrales, side='left') / max(len(impostor), 1)
+    frr = 1.0 - np.searchsorted(np.sort(genuinas), umbrales, side='left') / max(len(genuinas), 1)
+
+    # La FAR crece con el umbral: el mayor umbral que la cumple es la k-ésima
+    # distancia de impostor (acepta como mucho k = FAR·n impostores)
+    permitidos = int(np.floor(far_objetivo * len(impostor)))
+    if permitidos < len(impostor):
+        umbral = float(impostor[permitidos])
+    elif len(umbrales):
+        umbral = float(umbrales[-1] * 1.05)
+    else:
+        umbral = np.inf
+
+    return {
+        'umbrales': umbrales,
+        'far': far,
+        'frr': frr,
+        'threshold': umbral,
+        'far_at_threshold': float(np.searchsorted(impostor, umbral, side='left') / max(len(impostor), 1)),
+        'frr_at_threshold': float(np.mean(genuinas >= umbral)) if len(genuinas) else 0.0,
+    }
+
+def entrenar_modelo_avanzado(tipo='lbph', params=LBPH_PARAMS, workers=None):
     """Entrenar modelo con validación cruzada"""
     print('🚀 ENTRENADOR AVANZADO DE RECONOCIMIENTO FACIAL')
     print('='*60)
@@ -102,7 +315,7 @@ def entrenar_modelo_avanzado():
     verificar_calidad_imagenes()
     
     # Obtener datos
-    faces, labels = obtenerModelo()
+    faces, labels, nombres = obtenerModelo(color=tipo == 'embedding')
     
     if len(faces) == 0:
         print("❌ Error: No se encontraron imágenes válidas para entrenar")
@@ -121,70 +334,70 @@ def entrenar_modelo_avanzado():
         if response.lower() != 's':
             return
     
-    # Dividir datos para validación
-    X_train, X_test, y_train, y_test = train_test_split(
-        faces, labels, test_size=0.2, random_state=42, stratify=labels
-    )
-    
-    print(f"📚 Datos de entrenamiento: {len(X_train)} imágenes")
-    print(f"🧪 Datos de prueba: {len(X_test)} imágenes")
-    
-    # Crear y entrenar reconocedor
-    print("\n🤖 Entrenando modelo...")
-    face_recognizer = cv2.face.LBPHFaceRecognizer_create(
-        radius=2,          # Más preciso
-        neighbors=16,      # Más vecinos para mejor precisión
-        grid_x=8,         # Mayor resolución
-        grid_y=8,
-        threshold=80.0     # Umbral más alto para ser más estricto
-    )
-    
-    face_recognizer.train(X_train, np.array(y_train))
-    
-    # Validar modelo
-    print("🧪 Validando modelo...")
-    correct_predictions = 0
-    total_predictions = len(X_test)
-    
-    confidences = []
-    
-    for i, (test_face, true_label) in enumerate(zip(X_test, y_test)):
-        predicted_label, confidence = face_recognizer.predict(test_face)
-        confidences.append(confidence)
-        
-        if predicted_label == true_label:
-            correct_predictions += 1
-    
+    # Evaluar con validación cruzada en paralelo
+    print("\n🧪 Evaluando modelo con validación cruzada...")
+    evaluacion = evaluar_kfold(faces, labels, params, max_workers=workers, tipo=tipo)
+    y_true = evaluacion['y_true']
+    y_pred = evaluacion['y_pred']
+    dist = evaluacion['dist']
+
+    correct_predictions = int(np.sum(y_pred == y_true))
+    total_predictions = len(y_true)
     accuracy = (correct_predictions / total_predictions) * 100
-    avg_confidence = np.mean(confidences)
-    
-    print(f"📈 Resultados de validación:")
+    avg_confidence = np.mean(dist)
+    predict_ms = evaluacion['predict_seconds'] * 1000 / total_predictions
+
+    print(f"📈 Resultados de validación ({evaluacion['folds']} folds, {evaluacion['workers']} procesos):")
     print(f"   • Precisión: {accuracy:.1f}%")
-    print(f"   • Confianza promedio: {avg_confidence:.1f}")
+    print(f"   • Confianza promedio: {avg_confidence:.4g}")
     print(f"   • Predicciones correctas: {correct_predictions}/{total_predictions}")
-    
-    # Determinar umbral recomendado
+    print(f"   • Tiempo de evaluación: {evaluacion['wall_seconds']:.1f}s ({predict_ms:.1f} ms/rostro)")
+
+    # Determinar umbral recomendado a partir de la curva completa
+    barrido = barrido_umbral(y_true, y_pred, dist, evaluacion['impostor'])
+    recommended_threshold = barrido['threshold']
+    print(f"🎚️ Umbral para FAR <= {FAR_OBJETIVO:.0%}: {recommended_threshold:.4g} "
+          f"(FAR {barrido['far_at_threshold']:.1%}, FRR {barrido['frr_at_threshold']:.1%})")
     if accuracy > 90:
-        recommended_threshold = int(avg_confidence * 1.2)
-        print(f"✅ Modelo excelente. Umbral recomendado: {recommended_threshold}")
+        print("✅ Modelo excelente.")
     elif accuracy > 75:
-        recommended_threshold = int(avg_confidence * 1.5)
-        print(f"⚠️ Modelo aceptable. Umbral recomendado: {recommended_threshold}")
+        print("⚠️ Modelo aceptable.")
     else:
-        recommended_threshold = int(avg_confidence * 2.0)
-        print(f"❌ Modelo pobre. Necesitas más/mejores imágenes. Umbral: {recommended_threshold}")
-    
+        print("❌ Modelo pobre. Necesitas más/mejores imágenes.")
+
+    # Entrenar el modelo final con todas las imágenes
+    print("\n🤖 Entrenando modelo final...")
+    t0 = time.perf_counter()
+    face_recognizer = crear_reconocedor(tipo, **params)
+    face_recognizer.train(faces, np.array(labels))
+    face_recognizer.setThreshold(recommended_threshold)
+    guardar_nombres(face_recognizer, nombres)
+    final_train_seconds = time.perf_counter() - t0
+
     # Guardar modelo
-    model_path = 'FacesModel.xml'
+    model_path = MODEL_PATHS[tipo]
     face_recognizer.write(model_path)
     
     # Guardar configuración recomendada
-    config_path = 'model_config.txt'
+    config_path = CONFIG_PATH
     with open(config_path, 'w') as f:
-        f.write(f"recommended_threshold={recommended_threshold}\n")
+        f.write(f"recognizer={tipo}\n")
+        f.write(f"model_path={model_path}\n")
+        if tipo == 'embedding':
+            f.write(f"embedding_model={params['model']}\n")
+        f.write(f"recommended_threshold={recommended_threshold:.6g}\n")
+        f.write(f"target_far={FAR_OBJETIVO}\n")
+        f.write(f"far={barrido['far_at_threshold']:.4f}\n")
+        f.write(f"frr={barrido['frr_at_threshold']:.4f}\n")
         f.write(f"accuracy={accuracy:.1f}\n")
-        f.write(f"avg_confidence={avg_confidence:.1f}\n")
+        f.write(f"avg_confidence={avg_confidence:.4g}\n")
         f.write(f"total_images={len(faces)}\n")
+        f.write(f"folds={evaluacion['folds']}\n")
+        f.write(f"eval_workers={evaluacion['workers']}\n")
+        f.write(f"eval_seconds={evaluacion['wall_seconds']:.2f}\n")
+        f.write(f"eval_train_seconds={evaluacion['train_seconds']:.2f}\n")
+        f.write(f"eval_predict_ms_per_face={predict_ms:.3f}\n")
+        f.write(f"final_train_seconds={final_train_seconds:.2f}\n")
     
     print(f"\n✅ Modelo guardado como: {model_path}")
     print(f"⚙️ Configuración guardada en: {config_path}")
@@ -193,4 +406,19 @@ def entrenar_modelo_avanzado():
     return recommended_threshold
 
 if __name__ == "__main__":
-    entrenar_modelo_avanzado()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Entrenador avanzado de reconocimiento facial')
+    parser.add_argument('--reconocedor', choices=sorted(MODEL_PATHS), default='lbph')
+    parser.add_argument('--rotacion-invariante', action='store_true',
+                        help='Con uniform_lbph: usar patrones uniformes invariantes a rotación')
+    parser.add_argument('--modelo-embeddings', default=SFACE_MODEL,
+                        help='Con embedding: archivo ONNX del modelo de rostros')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Procesos de validación cruzada (por defecto, los que caben en RAM)')
+    args = parser.parse_args()
+
+    params = dict(LBPH_PARAMS)
+    if args.reconocedor == 'uniform_lbph':
+        params['rotation_invariant'] = args.rotacion_invariante
+    elif args.reconocedor == 'embedding':
+        params = dict(model=args.modelo_embeddings)
+    entrenar_modelo_avanzado(args.reconocedor, params, args.workers)
\ No newline at end of file
@@ -0,0 +1,178 @@
+import cv2
+import os
+import time
+import argparse
+import importlib.util
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from BufferPool import BufferPool
+from FacePipeline import detectar_rostros, iniciar_worker, reconocedor_worker
+
+FRAMES_POR_BLOQUE = 1800  # ~1 minuto de video a 30 fps por tarea
+
+COLUMNAS = {
+    'video': np.int32, 'frame': np.int64, 'time_s': np.float64,
+    'x': np.int32, 'y': np.int32, 'w': np.int32, 'h': np.int32,
+    'label': np.int32, 'name': str, 'distance': np.float64, 'accepted': np.bool_,
+}
+
+def dividir_en_bloques(videos, frames_por_bloque=FRAMES_POR_BLOQUE, paso=1):
+    """Bloques (video, inicio, fin) que empiezan en múltiplos del paso"""
+    frames_por_bloque = max(paso, frames_por_bloque - frames_por_bloque % paso)
+    bloques = []
+    for i, video in enumerate(videos):
+        cap = cv2.VideoCapture(video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if total <= 0:
+            print(f"⚠️  No se pudo leer {video} - omitido")
+            continue
+        for inicio in range(0, total, frames_por_bloque):
+            bloques.append((i, video, inicio, min(inicio + frames_por_bloque, total)))
+    return bloques
+
+def abrir_en_frame(video, inicio):
+    """VideoCapture cuyo próximo grab() lee el frame inicio; None si el video no llega"""
+    cap = cv2.VideoCapture(video)
+    if inicio == 0:
+        return cap
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, inicio) and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == inicio:
+        return cap
+    # Backend sin seek o que salta al keyframe: reabrir y avanzar frame a frame
+    cap.release()
+    cap = cv2.VideoCapture(video)
+    for _ in range(inicio):
+        if not cap.grab():
+            cap.release()
+            return None
+    return cap
+
+def procesar_bloque(tarea):
+    """Detectar y reconocer los frames [inicio, fin) de un video cada `paso` frames"""
+    indice, video, inicio, fin, paso, voltear = tarea
+    t0 = time.perf_counter()
+    filas = {col: [] for col in COLUMNAS}
+    pool = BufferPool()
+    reconocedor = reconocedor_worker()
+
+    cap = abrir_en_frame(video, inicio)
+    if cap is None:
+        print(f"⚠️  {video}: no se pudo llegar al frame {inicio} - bloque omitido")
+        fin = inicio
+    captura = None
+    procesados = 0
+
+    for n in range(inicio, fin):
+        # grab() decodifica sin copiar el frame; solo se recupera cada `paso` frames
+        if not cap.grab():
+            break
+        if (n - inicio) % paso:
+            continue
+        ret, captura = cap.retrieve(captura)
+        if not ret:
+            break
+
+        frame = cv2.flip(captura, -1, dst=pool.get('frame', captura.shape)) if voltear else captura
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pool.get('gray', frame.shape[:2]))
+        faces = detectar_rostros(reconocedor.detector, gray)
+        identidades = reconocedor.identificar(reconocedor.recortes(frame, gray, faces, pool))
+        procesados += 1
+        # Marca de tiempo del contenedor: n / fps se desvía con fps variable
+        time_s = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+        for (x, y, w, h), identidad in zip(faces, identidades):
+            for col, valor in (('video', indice), ('frame', n), ('time_s', time_s),
+                               ('x', x), ('y', y), ('w', w), ('h', h),
+                               ('label', identidad['label']), ('name', identidad['name'] or ''),
+                               ('distance', identidad['distance']),
+                               ('accepted', identidad['accepted'])):
+                filas[col].append(valor)
+    if cap is not None:
+        cap.release()
+
+    columnas = {col: np.array(filas[col], dtype=dtype) for col, dtype in COLUMNAS.items()}
+    return indice, procesados, time.perf_counter() - t0, columnas
+
+def guardar_resultados(path, columnas, videos, frames_procesados):
+    """Escribir las detecciones en columnas (.npz, o .parquet con pyarrow)"""
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tabla = {col: valores for col, valores in columnas.items()}
+        tabla['video_path'] = np.array(videos, dtype=object)[columnas['video']]
+        pq.write_table(pa.table(tabla), path)
+        return
+
+    np.savez_compressed(path, **columnas, videos=np.array(videos),
+                        frames_processed=np.array(frames_procesados, dtype=np.int64))
+
+def identificar_videos(videos, salida, procesos=None, paso=1, frames_por_bloque=FRAMES_POR_BLOQUE,
+                       voltear=False):
+    """Procesar videos completos en bloques repartidos entre procesos"""
+    if salida.endswith('.parquet') and importlib.util.find_spec('pyarrow') is None:
+        print("❌ Para .parquet instala pyarrow (pip install pyarrow); usa .npz si no")
+        return None
+
+    bloques = dividir_en_bloques(videos, frames_por_bloque, paso)
+    if not bloques:
+        print("❌ No hay videos para procesar")
+        return None
+
+    procesos = procesos or os.cpu_count() or 1
+    print(f"🎞️  {len(videos)} video(s) en {len(bloques)} bloques de hasta {frames_por_bloque} frames, "
+          f"paso {paso}, {procesos} proceso(s)")
+
+    partes = []
+    frames_procesados = [0] * len(videos)
+    segundos_worker = 0.0
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=iniciar_worker) as executor:
+        # Los bloques más largos primero para no dejar uno grande al final
+        tareas = [executor.submit(procesar_bloque, (i, video, inicio, fin, paso, voltear))
+                  for i, video, inicio, fin in sorted(bloques, key=lambda b: b[2] - b[3])]
+        for hechos, futuro in enumerate(as_completed(tareas), 1):
+            indice, procesados, segundos, columnas = futuro.result()
+            frames_procesados[indice] += procesados
+            segundos_worker += segundos
+            partes.append(columnas)
+            if hechos % 10 == 0 or hechos == len(tareas):
+                print(f"   {hechos}/{len(tareas)} bloques | {sum(frames_procesados)} frames")
+    total_seconds = time.perf_counter() - t0
+
+    # Orden por video y frame, independiente del orden en que terminaron los bloques
+    columnas = {col: np.concatenate([p[col] for p in partes]) for col in COLUMNAS}
+    orden = np.lexsort((columnas['frame'], columnas['video']))
+    columnas = {col: valores[orden] for col, valores in columnas.items()}
+
+    guardar_resultados(salida, columnas, videos, frames_procesados)
+
+    total_frames = sum(frames_procesados)
+    fps_total = total_frames / total_seconds
+    nucleos = min(procesos, os.cpu_count() or 1)
+    print("\n" + "="*70)
+    print(f"📊 {total_frames} frames procesados, {len(columnas['frame'])} rostros "
+          f"({int(columnas['accepted'].sum())} autorizados)")
+    print(f"⏱️  {total_seconds:.1f}s: {fps_total:.1f} frames/s en total, "
+          f"{fps_total / nucleos:.1f} frames/s por núcleo ({nucleos} núcleo(s)) "
+          f"({total_frames / segundos_worker:.1f} frames/s dentro de cada proceso)")
+    print(f"💾 Resultados en {salida}")
+    print("="*70)
+    return columnas
+
+def main():
+    parser = argparse.ArgumentParser(description='Identificación por lotes sobre videos grabados')
+    parser.add_argument('videos', nargs='+')
+    parser.add_argument('--salida', default='identificaciones.npz',
+                        help='Archivo de resultados (.npz o .parquet)')
+    parser.add_argument('--procesos', type=int, default=None, help='Por defecto, un proceso por núcleo')
+    parser.add_argument('--paso', type=int, default=1, help='Procesar uno de cada N frames')
+    parser.add_argument('--frames-por-bloque', type=int, default=FRAMES_POR_BLOQUE)
+    parser.add_argument('--voltear', action='store_true',
+                        help='Rotar 180° como IntegratedSystem (grabaciones directas de la ESP32-CAM)')
+    args = parser.parse_args()
+    identificar_videos(args.videos, args.salida, args.procesos, max(1, args.paso),
+                       args.frames_por_bloque, args.voltear)
+
+if __name__ == "__main__":
+    main()
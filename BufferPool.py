@@ -0,0 +1,66 @@
+import sys
+import tracemalloc
+import numpy as np
+
+class BufferPool:
+    """Buffers preasignados por (nombre, forma, dtype) para reutilizar con dst="""
+
+    def __init__(self, debug=False):
+        self._buffers = {}
+        self.debug = debug
+        self.frames = 0
+        # Solo cuentan los buffers nuevos del pool; lo que reservan OpenCV y numpy
+        # fuera del pool se mide con tracemalloc (debug) en bytes_pico_frame
+        self.reservas_pool = 0
+        self.reservas_pool_ultimo_frame = 0
+        self.bytes_pico_frame = 0
+        self._reservas_frame = 0
+        self._base_frame = 0
+        if debug:
+            # tracemalloc ve también los arrays que crea OpenCV (usan el asignador de numpy)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._base_frame = tracemalloc.get_traced_memory()[0]
+
+    def get(self, nombre, shape, dtype=np.uint8):
+        """Buffer reutilizable; solo se reserva la primera vez que se pide esa forma"""
+        clave = (nombre, tuple(shape), np.dtype(dtype))
+        buf = self._buffers.get(clave)
+        if buf is None:
+            buf = self._buffers[clave] = np.empty(shape, dtype=dtype)
+            self.reservas_pool += 1
+            self._reservas_frame += 1
+        return buf
+
+    def nuevo_frame(self):
+        """Cerrar los contadores del frame que acaba de terminar"""
+        self.frames += 1
+        self.reservas_pool_ultimo_frame = self._reservas_frame
+        self._reservas_frame = 0
+        if self.debug:
+            actual, pico = tracemalloc.get_traced_memory()
+            self.bytes_pico_frame = pico - self._base_frame
+            tracemalloc.reset_peak()
+            self._base_frame = actual
+
+    def reporte(self):
+        """Resumen de asignaciones y memoria para depuración"""
+        pool_mb = sum(b.nbytes for b in self._buffers.values()) / 1e6
+        texto = (f"frames={self.frames} buffers={len(self._buffers)} ({pool_mb:.1f} MB) "
+                 f"reservas_pool={self.reservas_pool} en_ultimo_frame={self.reservas_pool_ultimo_frame}")
+        if self.debug:
+            # Métrica por frame: memoria Python/numpy/OpenCV reservada en el último frame
+            rss = rss_pico_mb()
+            texto += (f" bytes_pico_frame={self.bytes_pico_frame}"
+                      f" rss_pico={'n/d' if rss is None else f'{rss:.0f} MB'}")
+        return texto
+
+def rss_pico_mb():
+    """RSS máximo del proceso actual en MB; None donde no se puede leer (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB y macOS bytes
+    return pico / 1e6 if sys.platform == 'darwin' else pico / 1024
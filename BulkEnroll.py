@@ -0,0 +1,234 @@
+import cv2
+import os
+import re
+import json
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from BatchVideoIdentify import abrir_en_frame, dividir_en_bloques
+from CaptureCoverage import CoberturaCaptura
+from FacePipeline import FACE_SIZE, cargar_detector
+
+# Detección para enrolamiento: más permisiva que en la puerta, pero sin recortes
+# menores a 100 px (los que AdvancedTrainer descarta)
+ENROLL_DETECTION_PARAMS = dict(scaleFactor=1.1, minNeighbors=5, minSize=(100, 100))
+
+NITIDEZ_MINIMA = 80  # Varianza del laplaciano, como en ESP32_Capture_Intensive
+PASO_VIDEO = 5       # Un frame de cada N para no guardar casi duplicados
+IMAGENES_POR_TAREA = 50
+EXTENSIONES_VIDEO = ('.mp4', '.avi', '.mov', '.mkv', '.mjpeg')
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png')
+
+# Detector cargado una sola vez en cada proceso de trabajo
+_detector = None
+
+def _iniciar_worker():
+    global _detector
+    _detector = cargar_detector()
+
+def validar_persona(persona):
+    """ValueError si el nombre no es una sola carpeta dentro de Data (rutas, '..', absolutas)"""
+    if (not isinstance(persona, str) or persona.strip() in ('', '.', '..')
+            # ':' también: en Windows 'C:x' es una ruta relativa a otra unidad
+            or any(sep in persona for sep in ('/', '\\', ':', '\0')) or os.path.isabs(persona)
+            or os.path.basename(persona) != persona):
+        raise ValueError(f"Nombre de persona inválido en el manifiesto: {persona!r} "
+                         "(debe ser un nombre de carpeta, sin rutas)")
+
+def leer_manifiesto(path):
+    """Manifiesto JSON persona -> lista de videos, carpetas o fotos"""
+    with open(path, 'r') as f:
+        manifiesto = json.load(f)
+    for persona in manifiesto:
+        validar_persona(persona)
+    return {persona: [fuentes] if isinstance(fuentes, str) else list(fuentes)
+            for persona, fuentes in manifiesto.items()}
+
+def crear_tareas(manifiesto, paso=PASO_VIDEO):
+    """Bloques de video y grupos de imágenes a repartir entre procesos"""
+    tareas = []
+    for persona, fuentes in manifiesto.items():
+        videos = []
+        imagenes = []
+        for fuente in fuentes:
+            if os.path.isdir(fuente):
+                imagenes += [os.path.join(fuente, f) for f in sorted(os.listdir(fuente))
+                             if f.lower().endswith(EXTENSIONES_IMAGEN)]
+            elif fuente.lower().endswith(EXTENSIONES_VIDEO):
+                videos.append(fuente)
+            elif fuente.lower().endswith(EXTENSIONES_IMAGEN):
+                imagenes.append(fuente)
+            else:
+                print(f"⚠️  {persona}: fuente no reconocida {fuente} - omitida")
+
+        for _, video, inicio, fin in dividir_en_bloques(videos, paso=paso):
+            tareas.append(('video', persona, video, inicio, fin))
+        for i in range(0, len(imagenes), IMAGENES_POR_TAREA):
+            tareas.append(('imagenes', persona, imagenes[i:i + IMAGENES_POR_TAREA], 0, 0))
+    return tareas
+
+def _mejor_rostro(frame, gray, nitidez_minima, cobertura):
+    """Recorte 150x150 en color del rostro más grande si pasa el filtro de calidad"""
+    faces = _detector.detectMultiScale(gray, **ENROLL_DETECTION_PARAMS)
+    if len(faces) == 0:
+        return None, 'sin_rostro'
+    # Una persona por fuente: el rostro más grande es el de la persona enrolada
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    rostro = gray[y:y + h, x:x + w]
+    nitidez = cv2.Laplacian(rostro, cv2.CV_16S).var()
+    if nitidez < nitidez_minima:
+        return None, 'borroso'
+    bin_rostro = cobertura.bin((x, y, w, h), gray.shape[1], rostro, nitidez)
+    # En color: los entrenadores LBPH lo leen en gris y los embeddings lo usan tal cual
+    recorte = cv2.resize(frame[y:y + h, x:x + w], FACE_SIZE, interpolation=cv2.INTER_CUBIC)
+    _, jpeg = cv2.imencode('.jpg', recorte)
+    return (jpeg.tobytes(), bin_rostro), 'aceptado'
+
+def procesar_tarea(tarea, paso=PASO_VIDEO, nitidez_minima=NITIDEZ_MINIMA):
+    """Recortes JPEG (orden, bytes, bin) y contadores de una fuente"""
+    tipo, persona, fuente, inicio, fin = tarea
+    t0 = time.perf_counter()
+    cobertura = CoberturaCaptura()
+    contadores = defaultdict(int)
+    recortes = []
+
+    if tipo == 'video':
+        cap = abrir_en_frame(fuente, inicio)
+        if cap is None:
+            contadores['ilegible'] += 1
+            fin = inicio
+        frame = None
+        gray = None
+        for n in range(inicio, fin):
+            if not cap.grab():
+                break
+            if (n - inicio) % paso:
+                continue
+            ret, frame = cap.retrieve(frame)
+            if not ret:
+                break
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+            contadores['leidos'] += 1
+            resultado, estado = _mejor_rostro(frame, gray, nitidez_minima, cobertura)
+            contadores[estado] += 1
+            if resultado is not None:
+                recortes.append(((fuente, n),) + resultado)
+        if cap is not None:
+            cap.release()
+    else:
+        for path in fuente:
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            contadores['leidos'] += 1
+            if frame is None:
+                contadores['ilegible'] += 1
+                continue
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            resultado, estado = _mejor_rostro(frame, gray, nitidez_minima, cobertura)
+            contadores[estado] += 1
+            if resultado is not None:
+                recortes.append(((path, 0),) + resultado)
+
+    return persona, recortes, dict(contadores), time.perf_counter() - t0
+
+def siguiente_numero(person_path):
+    """Primer número libre después del rostro_XXXX más alto de la carpeta"""
+    numeros = [int(m.group(1)) for f in os.listdir(person_path)
+               if (m := re.match(r'rostro_(\d+)\.jpg$', f))]
+    return max(numeros) + 1 if numeros else 0
+
+def guardar_recortes(data_path, persona, recortes, usar_cobertura):
+    """Escribir los recortes en Data/<persona> continuando la numeración"""
+    validar_persona(persona)
+    cobertura = CoberturaCaptura(separacion=0) if usar_cobertura else None
+    if not recortes:
+        # Sin carpeta vacía: sería una etiqueta más sin imágenes para el entrenador
+        return 0, cobertura
+    person_path = os.path.join(data_path, persona)
+    os.makedirs(person_path, exist_ok=True)
+    numero = siguiente_numero(person_path)
+
+    # Orden estable (fuente, frame) para que la numeración no dependa de los procesos
+    recortes = sorted(recortes, key=lambda r: r[0])
+    guardados = 0
+    for _, jpeg, bin_rostro in recortes:
+        if cobertura is not None:
+            if not cobertura.acepta(bin_rostro, 0):
+                continue
+            cobertura.registrar(bin_rostro, 0)
+        with open(os.path.join(person_path, f'rostro_{numero:04d}.jpg'), 'wb') as f:
+            f.write(jpeg)
+        numero += 1
+        guardados += 1
+    return guardados, cobertura
+
+def enrolar(manifiesto, data_path='Data', procesos=None, paso=PASO_VIDEO,
+            nitidez_minima=NITIDEZ_MINIMA, usar_cobertura=False):
+    """Detectar, filtrar y recortar rostros de todas las fuentes del manifiesto"""
+    tareas = crear_tareas(manifiesto, paso)
+    if not tareas:
+        print("❌ El manifiesto no tiene fuentes válidas")
+        return None
+
+    procesos = procesos or os.cpu_count() or 1
+    print(f"👥 {len(manifiesto)} persona(s), {len(tareas)} tareas, {procesos} proceso(s), "
+          f"paso de video {paso}")
+
+    recortes = defaultdict(list)
+    contadores = defaultdict(lambda: defaultdict(int))
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_worker) as executor:
+        futuros = [executor.submit(procesar_tarea, tarea, paso, nitidez_minima) for tarea in tareas]
+        for hechos, futuro in enumerate(as_completed(futuros), 1):
+            persona, nuevos, conteo, _ = futuro.result()
+            recortes[persona] += nuevos
+            for clave, valor in conteo.items():
+                contadores[persona][clave] += valor
+            if hechos % 10 == 0 or hechos == len(futuros):
+                print(f"   {hechos}/{len(futuros)} tareas")
+    total_seconds = time.perf_counter() - t0
+
+    print("\n" + "="*70)
+    print(f"{'Persona':<20}{'leídos':>8}{'sin rostro':>11}{'borrosos':>10}{'guardados':>11}{'rend.':>8}")
+    reporte = {}
+    for persona in manifiesto:
+        guardados, cobertura = guardar_recortes(data_path, persona, recortes[persona], usar_cobertura)
+        c = contadores[persona]
+        rendimiento = guardados / c['leidos'] if c['leidos'] else 0.0
+        reporte[persona] = dict(c, guardados=guardados)
+        texto = (f"{persona:<20}{c['leidos']:>8}{c['sin_rostro']:>11}{c['borroso']:>10}"
+                 f"{guardados:>11}{rendimiento:>8.0%}")
+        if cobertura is not None:
+            texto += f"  (bins llenos {cobertura.bins_llenos()}/{cobertura.conteo.size})"
+        print(texto)
+
+    leidos = sum(c['leidos'] for c in contadores.values())
+    print(f"\n⏱️  {leidos} frames/imágenes en {total_seconds:.1f}s: {leidos / total_seconds:.1f}/s "
+          f"({leidos / total_seconds / min(procesos, os.cpu_count() or 1):.1f}/s por núcleo)")
+    print(f"📂 Recortes en {data_path}/<persona>")
+    print("\n📋 PRÓXIMOS PASOS:")
+    print("   1. python AdvancedTrainer.py")
+    print("="*70)
+    return reporte
+
+def main():
+    parser = argparse.ArgumentParser(description='Enrolamiento masivo desde videos y carpetas de fotos')
+    parser.add_argument('manifiesto', help='JSON {"persona": ["video.mp4", "carpeta/", ...]}')
+    parser.add_argument('--data', default='Data')
+    parser.add_argument('--procesos', type=int, default=None, help='Por defecto, un proceso por núcleo')
+    parser.add_argument('--paso', type=int, default=PASO_VIDEO, help='Usar uno de cada N frames de video')
+    parser.add_argument('--nitidez-minima', type=float, default=NITIDEZ_MINIMA)
+    parser.add_argument('--cobertura', action='store_true',
+                        help='Guardar solo hasta llenar los bins de escala/pose/luz/nitidez')
+    args = parser.parse_args()
+    try:
+        manifiesto = leer_manifiesto(args.manifiesto)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    enrolar(manifiesto, args.data, args.procesos, max(1, args.paso),
+            args.nitidez_minima, args.cobertura)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+# Límites de cada descriptor: un valor cae en el bin del primer límite que no supera
+BINS_ESCALA = (0.22, 0.35)   # ancho del rostro / ancho del frame (lejos, medio, cerca)
+BINS_GIRO = (-0.05, 0.05)    # centroide horizontal de los bordes, proxy de pose (izq, frente, der)
+BINS_BRILLO = (85, 150)      # gris medio del rostro (oscuro, normal, claro)
+BINS_NITIDEZ = (250,)        # varianza del laplaciano, ya por encima del mínimo de calidad
+
+NOMBRES_BINS = {
+    'escala': ('lejos', 'medio', 'cerca'),
+    'giro': ('izq', 'frente', 'der'),
+    'brillo': ('oscuro', 'normal', 'claro'),
+    'nitidez': ('media', 'alta'),
+}
+
+FOTOS_POR_BIN = 3            # fotos que se guardan como máximo en cada bin
+COBERTURA_OBJETIVO = 0.85    # fracción de bins llenos que termina la sesión
+FRAMES_SIN_PROGRESO = 300    # terminar también si no se llena nada nuevo en este tiempo
+TAM_DESCRIPTOR = (64, 64)
+
+def giro_aproximado(rostro, pool=None):
+    """Desplazamiento (-1..1) del centroide horizontal de los bordes dentro del rostro"""
+    dst = pool.get('cobertura_rostro', TAM_DESCRIPTOR[::-1]) if pool is not None else None
+    dst_gx = pool.get('cobertura_gx', TAM_DESCRIPTOR[::-1], np.int16) if pool is not None else None
+    chico = cv2.resize(rostro, TAM_DESCRIPTOR, dst=dst, interpolation=cv2.INTER_AREA)
+    gx = cv2.Sobel(chico, cv2.CV_16S, 1, 0, dst=dst_gx)
+    energia = np.abs(gx, dtype=np.float32).sum(axis=0)
+    total = energia.sum()
+    if total == 0:
+        return 0.0
+    xs = np.linspace(-1.0, 1.0, TAM_DESCRIPTOR[0], dtype=np.float32)
+    return float(energia @ xs / total)
+
+class CoberturaCaptura:
+    """Bins de escala, pose, brillo y nitidez que se van llenando durante la captura"""
+
+    def __init__(self, fotos_por_bin=FOTOS_POR_BIN, objetivo=COBERTURA_OBJETIVO, separacion=8,
+                 sin_progreso=FRAMES_SIN_PROGRESO):
+        self.forma = (len(BINS_ESCALA) + 1, len(BINS_GIRO) + 1,
+                      len(BINS_BRILLO) + 1, len(BINS_NITIDEZ) + 1)
+        self.conteo = np.zeros(self.forma, dtype=np.int32)
+        self.ultimo_guardado = np.full(self.forma, -separacion, dtype=np.int64)
+        self.fotos_por_bin = fotos_por_bin
+        self.objetivo = objetivo
+        self.separacion = separacion
+        self.sin_progreso = sin_progreso
+        self.ultimo_progreso = None
+
+    def bin(self, caja, ancho_frame, rostro, nitidez, pool=None):
+        """Índice del bin de un rostro a partir de descriptores baratos"""
+        x, y, w, h = caja
+        return (
+            int(np.searchsorted(BINS_ESCALA, w / ancho_frame)),
+            int(np.searchsorted(BINS_GIRO, giro_aproximado(rostro, pool))),
+            int(np.searchsorted(BINS_BRILLO, cv2.mean(rostro)[0])),
+            int(np.searchsorted(BINS_NITIDEZ, nitidez)),
+        )
+
+    def acepta(self, indice, frame):
+        """True si el bin aún no está lleno y pasó la separación mínima desde su última foto"""
+        return (self.conteo[indice] < self.fotos_por_bin and
+                frame - self.ultimo_guardado[indice] >= self.separacion)
+
+    def registrar(self, indice, frame):
+        if self.conteo[indice] == 0:
+            self.ultimo_progreso = frame
+        self.conteo[indice] += 1
+        self.ultimo_guardado[indice] = frame
+
+    def bins_llenos(self):
+        return int((self.conteo >= self.fotos_por_bin).sum())
+
+    def cobertura(self):
+        return self.bins_llenos() / self.conteo.size
+
+    def completa(self):
+        return self.cobertura() >= self.objetivo
+
+    def estancada(self, frame):
+        """True si hace demasiados frames que no se ocupa un bin nuevo"""
+        return self.ultimo_progreso is not None and frame - self.ultimo_progreso > self.sin_progreso
+
+    def etiqueta(self, indice):
+        return '/'.join(nombres[i] for nombres, i in zip(NOMBRES_BINS.values(), indice))
+
+    def resumen(self):
+        """Fotos guardadas por valor de cada descriptor"""
+        lineas = []
+        for eje, (descriptor, nombres) in enumerate(NOMBRES_BINS.items()):
+            otros = tuple(i for i in range(self.conteo.ndim) if i != eje)
+            por_valor = self.conteo.sum(axis=otros)
+            lineas.append(f"{descriptor}: " + ', '.join(f"{n}={c}" for n, c in zip(nombres, por_valor)))
+        return lineas
@@ -0,0 +1,229 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+
+from AdvancedTrainer import (LBPH_PARAMS, obtenerModelo, dividir_holdout, barrido_umbral,
+                             predecir_con_impostores)
+from FaceModels import (MODEL_PATHS, cargar_config, guardar_config, crear_reconocedor, guardar_nombres,
+                        parametros_modelo)
+from UniformLBPH import UniformLBPHRecognizer, distancia_chi2
+from EmbeddingRecognizer import EmbeddingRecognizer, SFACE_MODEL
+
+# Número de prototipos por persona a probar
+PROTOTIPOS = [1, 2, 3, 5, 8, 12, 20, 30, 50]
+
+def matriz_distancias(histograms):
+    """Distancias chi-cuadrado entre todos los histogramas de una persona"""
+    sumas = histograms.sum(axis=1)
+    return np.stack([distancia_chi2(histograms, sumas, h) for h in histograms])
+
+def k_medoides(dist, k, max_iter=20):
+    """Índices de k medoides a partir de una matriz de distancias"""
+    n = len(dist)
+    if k >= n:
+        return np.arange(n)
+
+    # Inicio determinista: el medoide global y luego el punto más lejano cada vez
+    medoides = [int(np.argmin(dist.sum(axis=1)))]
+    while len(medoides) < k:
+        medoides.append(int(np.argmax(dist[:, medoides].min(axis=1))))
+    medoides = np.array(medoides)
+
+    for _ in range(max_iter):
+        asignacion = np.argmin(dist[:, medoides], axis=1)
+        nuevos = medoides.copy()
+        for c in range(k):
+            miembros = np.flatnonzero(asignacion == c)
+            if len(miembros) > 0:
+                internas = dist[np.ix_(miembros, miembros)].sum(axis=1)
+                nuevos[c] = miembros[np.argmin(internas)]
+        if np.array_equal(nuevos, medoides):
+            break
+        medoides = nuevos
+
+    return np.sort(medoides)
+
+def distancias_por_persona(faces, labels, tipo, params):
+    """Por persona, las distancias entre sus imágenes (LBP uniforme o coseno de embeddings)"""
+    if tipo == 'embedding':
+        extractor = EmbeddingRecognizer(**params)
+    else:
+        # Con lbph se agrupa con LBP uniforme de la misma geometría
+        extractor = UniformLBPHRecognizer(**params)
+    por_persona = {}
+    for label in np.unique(labels):
+        indices = np.flatnonzero(labels == label)
+        if tipo == 'embedding':
+            embeddings = extractor.embed(list(faces[indices]))
+            dist = 1.0 - embeddings @ embeddings.T
+        else:
+            histograms = np.stack([extractor.extraer(faces[i]) for i in indices])
+            dist = matriz_distancias(histograms)
+        por_persona[label] = (indices, dist)
+    return por_persona
+
+def seleccionar(por_persona, k):
+    """Índices de las imágenes que quedan como prototipos con k por persona"""
+    return np.concatenate([
+        indices[k_medoides(dist, k)] for indices, dist in por_persona.values()
+    ])
+
+def evaluar(tipo, params, X_train, y_train, X_test, y_test):
+    """Entrenar con la galería dada y medir tamaño, latencia y precisión"""
+    recognizer = crear_reconocedor(tipo, **params)
+    recognizer.train(list(X_train), y_train)
+
+    fd, model_path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        recognizer.write(model_path)
+        model_mb = os.path.getsize(model_path) / 1e6
+    finally:
+        os.remove(model_path)
+
+    y_pred = np.empty(len(X_test), dtype=np.int32)
+    dist = np.empty(len(X_test), dtype=np.float64)
+    t0 = time.perf_counter()
+    for i, face in enumerate(X_test):
+        y_pred[i], dist[i] = recognizer.predict(face)
+    predict_ms = (time.perf_counter() - t0) * 1000 / len(X_test)
+    _, _, impostor = predecir_con_impostores(recognizer, X_test, y_test)
+
+    return {
+        'galeria': len(X_train),
+        'model_mb': model_mb,
+        'predict_ms': predict_ms,
+        'accuracy': 100.0 * np.mean(y_pred == y_test),
+        'y_pred': y_pred,
+        'dist': dist,
+        'impostor': impostor,
+    }
+
+def condensar(tipo, params, prototipos=PROTOTIPOS, tolerancia=0.5):
+    """Elegir el número de prototipos en una validación interna y reportarlo en el holdout"""
+    faces, labels, nombres = obtenerModelo()
+    if len(faces) == 0:
+        print("❌ Error: No se encontraron imágenes válidas para entrenar")
+        return None
+
+    X_train, X_test, y_train, y_test = dividir_holdout(faces, labels)
+    X_train = np.asarray(X_train, dtype=np.uint8)
+    X_test = np.asarray(X_test, dtype=np.uint8)
+    y_train = np.asarray(y_train, dtype=np.int32)
+    y_test = np.asarray(y_test, dtype=np.int32)
+
+    # k se elige en una división interna del entrenamiento: el holdout solo se usa
+    # para el reporte final y su precisión no está sesgada por la selección
+    X_fit, X_val, y_fit, y_val = dividir_holdout(X_train, y_train)
+    X_fit = np.asarray(X_fit, dtype=np.uint8)
+    X_val = np.asarray(X_val, dtype=np.uint8)
+    y_fit = np.asarray(y_fit, dtype=np.int32)
+    y_val = np.asarray(y_val, dtype=np.int32)
+
+    print(f"📚 Selección de k: {len(X_fit)} imágenes | validación: {len(X_val)} | "
+          f"🧪 holdout: {len(X_test)}")
+    completa_val = evaluar(tipo, params, X_fit, y_fit, X_val, y_val)
+    print(f"   Completa: {completa_val['accuracy']:.1f}% | {completa_val['predict_ms']:.2f} ms/rostro | "
+          f"{completa_val['model_mb']:.1f} MB")
+
+    print("\n🧩 Agrupando histogramas por persona...")
+    por_persona = distancias_por_persona(X_fit, y_fit, tipo, params)
+    max_por_persona = max(len(indices) for indices, _ in por_persona.values())
+
+    resultados = []
+    for k in sorted(prototipos):
+        if k >= max_por_persona:
+            break
+        seleccion = seleccionar(por_persona, k)
+        r = evaluar(tipo, params, X_fit[seleccion], y_fit[seleccion], X_val, y_val)
+        r['k'] = k
+        resultados.append(r)
+        print(f"   k={k:>3}: {r['galeria']:>5} imágenes | {r['accuracy']:.1f}% | "
+              f"{r['predict_ms']:.2f} ms/rostro | {r['model_mb']:.2f} MB")
+
+    # El menor k que no pierde más de la tolerancia respecto a la galería completa
+    aceptables = [r for r in resultados if r['accuracy'] >= completa_val['accuracy'] - tolerancia]
+    if not aceptables:
+        print(f"\n⚠️ Ningún número de prototipos mantiene la precisión (tolerancia {tolerancia} pts)")
+        return None
+    k = aceptables[0]['k']
+
+    # Reporte en el holdout intacto: galería completa contra k prototipos del entrenamiento
+    completa = evaluar(tipo, params, X_train, y_train, X_test, y_test)
+    seleccion = seleccionar(distancias_por_persona(X_train, y_train, tipo, params), k)
+    elegido = evaluar(tipo, params, X_train[seleccion], y_train[seleccion], X_test, y_test)
+    elegido['k'] = k
+
+    print(f"\n📊 REPORTE DE CONDENSACIÓN (k={elegido['k']} prototipos por persona)")
+    print(f"   • Galería: {completa['galeria']} → {elegido['galeria']} imágenes")
+    print(f"   • Tamaño del modelo: {completa['model_mb']:.1f} MB → {elegido['model_mb']:.2f} MB "
+          f"({completa['model_mb'] / max(elegido['model_mb'], 1e-9):.0f}x menor)")
+    print(f"   • Latencia: {completa['predict_ms']:.2f} → {elegido['predict_ms']:.2f} ms/rostro "
+          f"({completa['predict_ms'] / max(elegido['predict_ms'], 1e-9):.1f}x más rápido)")
+    print(f"   • Precisión: {completa['accuracy']:.1f}% → {elegido['accuracy']:.1f}%")
+
+    # Umbral recalculado: las distancias a prototipos son mayores que al vecino más cercano
+    barrido = barrido_umbral(y_test, elegido['y_pred'], elegido['dist'], elegido['impostor'])
+    elegido['threshold'] = barrido['threshold']
+    elegido['faces'] = np.asarray(faces, dtype=np.uint8)
+    elegido['labels'] = np.asarray(labels, dtype=np.int32)
+    elegido['nombres'] = nombres
+    return elegido
+
+def main():
+    config = cargar_config()
+    parser = argparse.ArgumentParser(description='Condensar la galería a unos pocos prototipos por persona')
+    parser.add_argument('--reconocedor', choices=sorted(MODEL_PATHS),
+                        default=config.get('recognizer', 'lbph'))
+    parser.add_argument('--prototipos', type=int, nargs='+', default=PROTOTIPOS,
+                        help='Números de prototipos por persona a probar')
+    parser.add_argument('--tolerancia', type=float, default=0.5,
+                        help='Puntos de precisión que se aceptan perder')
+    parser.add_argument('--solo-reporte', action='store_true',
+                        help='No guardar el modelo condensado ni tocar model_config.txt')
+    args = parser.parse_args()
+
+    print('🚀 CONDENSACIÓN DE GALERÍA')
+    print('='*60)
+
+    # Mismos parámetros que el modelo actual; por defecto si se cambia de reconocedor
+    params = None
+    if args.reconocedor == config.get('recognizer', 'lbph'):
+        params = parametros_modelo(config)
+    if params is None:
+        params = dict(LBPH_PARAMS)
+        if args.reconocedor == 'embedding':
+            params = dict(model=config.get('embedding_model', SFACE_MODEL))
+    print(f"⚙️ Parámetros: {params}")
+    elegido = condensar(args.reconocedor, params, args.prototipos, args.tolerancia)
+    if elegido is None or args.solo_reporte:
+        return
+
+    # Modelo final: prototipos elegidos sobre todas las imágenes
+    por_persona = distancias_por_persona(elegido['faces'], elegido['labels'], args.reconocedor, params)
+    seleccion = seleccionar(por_persona, elegido['k'])
+    recognizer = crear_reconocedor(args.reconocedor, **params)
+    recognizer.train(list(elegido['faces'][seleccion]), elegido['labels'][seleccion])
+    recognizer.setThreshold(elegido['threshold'])
+    guardar_nombres(recognizer, elegido['nombres'])
+
+    base, ext = os.path.splitext(MODEL_PATHS[args.reconocedor])
+    model_path = f"{base}_condensado{ext}"
+    recognizer.write(model_path)
+
+    config.update({
+        'recognizer': args.reconocedor,
+        'model_path': model_path,
+        'recommended_threshold': f"{elegido['threshold']:.6g}",
+        'prototypes_per_person': elegido['k'],
+        'gallery_images': len(seleccion),
+    })
+    guardar_config(config)
+
+    print(f"\n✅ Modelo condensado guardado como: {model_path} ({len(seleccion)} prototipos)")
+    print(f"⚙️ Configuración actualizada (umbral {elegido['threshold']:.4g})")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 import cv2
 import os
+import numpy as np
+
+from BufferPool import BufferPool
+from CaptureCoverage import CoberturaCaptura
+from FacePipeline import cargar_detector
 
 def main():
     # Crear carpeta Data si no existe
@@ -27,6 +32,10 @@ def main():
         os.makedirs(personPath)
         existing_photos = 0
     
+    # Modo cobertura: guardar solo rostros que llenan bins nuevos y parar al cubrirlos
+    modo = input("Modo de captura: [c]obertura (por defecto) o [m]asivo (meta de fotos): ")
+    cobertura = None if modo.strip().lower() == 'm' else CoberturaCaptura()
+    
     # CONECTAR A ESP32-CAM - Probar múltiples URLs
     esp32_urls = [
         'http://192.168.88.12:81/stream',
@@ -68,7 +77,7 @@ def main():
     print(f"📹 Conectado a: {working_url}")
     
     # Cargar detector de rostros
-    faceClassif = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    faceClassif = cargar_detector()
     
     # CONFIGURACIÓN PARA ENTRENAMIENTO ROBUSTO
     count = 0
@@ -83,7 +92,11 @@ def main():
     print(f"👤 Persona: {personName}")
     print(f"📁 Carpeta: {personPath}")
     print(f"📊 Fotos existentes: {existing_photos}")
-    print(f"🎯 Meta total: {target_photos} fotos")
+    if cobertura is None:
+        print(f"🎯 Meta total: {target_photos} fotos")
+    else:
+        print(f"🎯 Meta: {cobertura.objetivo:.0%} de {cobertura.conteo.size} bins "
+              f"(escala x pose x luz x nitidez), {cobertura.fotos_por_bin} fotos por bin")
     print(f"🎥 Fuente: {working_url}")
     print("\n📋 INSTRUCCIONES PARA 1000 FOTOS:")
     print("• 🔄 MUÉVETE CONSTANTEMENTE - cabeza, expresiones, distancia")
@@ -98,21 +111,26 @@ def main():
     frames_between_saves = 8  # CAMBIADO: Cada 8 frames (era 3) - más selectivo
     min_blur_threshold = 80   # CAMBIADO: Más estricto con calidad (era 30)
     
-    while count < max_photos and saved_photos < (target_photos - existing_photos):
-        ret, frame = cap.read()
+    # Buffers reutilizados en cada frame
+    pool = BufferPool()
+    captura = None
+    
+    while count < max_photos and (cobertura is not None or saved_photos < (target_photos - existing_photos)):
+        ret, captura = cap.read(captura)
         if not ret:
             print("❌ Error capturando video desde ESP32-CAM")
             break
         
         # VOLTEAR LA IMAGEN SI ESTÁ AL REVÉS
-        frame = cv2.flip(frame, -1)  # Voltear horizontal y vertical (180°)
+        frame = cv2.flip(captura, -1, dst=pool.get('frame', captura.shape))  # Voltear horizontal y vertical (180°)
         # Si necesitas otra rotación, usa una de estas:
         # frame = cv2.flip(frame, 0)   # Solo voltear vertical
         # frame = cv2.flip(frame, 1)   # Solo voltear horizontal
         
         # Convertir a escala de grises
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        auxFrame = gray.copy()
+        # Los rectángulos se dibujan en frame, así que gray no necesita copia
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pool.get('gray', frame.shape[:2]))
+        laplaciano = pool.get('laplaciano', gray.shape, np.int16)
         
         # Detectar rostros - MÁS PERMISIVO
         faces = faceClassif.detectMultiScale(
@@ -126,15 +144,27 @@ def main():
         # Procesar cada rostro detectado
         for (x, y, w, h) in faces:
             # Extraer rostro
-            rostro = auxFrame[y:y + h, x:x + w]
+            rostro = gray[y:y + h, x:x + w]
             
-            # Verificar calidad básica
-            blur_value = cv2.Laplacian(rostro, cv2.CV_64F).var()
+            # Verificar calidad básica (int16 basta para el laplaciano de uint8)
+            lap = cv2.Laplacian(rostro, cv2.CV_16S, dst=laplaciano[y:y + h, x:x + w])
+            blur_value = cv2.meanStdDev(lap)[1][0, 0] ** 2
             
-            # GUARDAR CADA POCOS FRAMES con calidad mínima
-            if blur_value > min_blur_threshold and count % frames_between_saves == 0:
-                # Redimensionar a tamaño estándar
-                rostro_resized = cv2.resize(rostro, (150, 150), interpolation=cv2.INTER_CUBIC)
+            # GUARDAR CADA POCOS FRAMES con calidad mínima (o si llena un bin nuevo)
+            bin_rostro = None
+            if cobertura is None:
+                guardar = blur_value > min_blur_threshold and count % frames_between_saves == 0
+            elif blur_value > min_blur_threshold:
+                bin_rostro = cobertura.bin((x, y, w, h), frame.shape[1], rostro, blur_value, pool)
+                guardar = cobertura.acepta(bin_rostro, count)
+            else:
+                guardar = False
+            
+            if guardar:
+                # Redimensionar a tamaño estándar, en color (los entrenadores LBPH lo leen en gris)
+                rostro_resized = cv2.resize(frame[y:y + h, x:x + w], (150, 150),
+                                            dst=pool.get('rostro', (150, 150, 3)),
+                                            interpolation=cv2.INTER_CUBIC)
                 
                 # Guardar foto
                 filename = f'rostro_{start_number + saved_photos:04d}.jpg'
@@ -142,8 +172,12 @@ def main():
                 cv2.imwrite(filepath, rostro_resized)
                 saved_photos += 1
                 
+                if cobertura is not None:
+                    cobertura.registrar(bin_rostro, count)
+                    print(f"📸 {cobertura.etiqueta(bin_rostro)} | Bins llenos: "
+                          f"{cobertura.bins_llenos()}/{cobertura.conteo.size} ({cobertura.cobertura():.0%})")
                 # Mostrar progreso cada 25 fotos
-                if saved_photos % 25 == 0:
+                elif saved_photos % 25 == 0:
                     total_current = existing_photos + saved_photos
                     remaining = target_photos - total_current
                     progress = (total_current * 100) // target_photos
@@ -151,10 +185,15 @@ def main():
             
             # Dibujar rectángulo en el video
             color = (0, 255, 0) if blur_value > min_blur_threshold else (0, 165, 255)
+            if bin_rostro is not None and not guardar:
+                color = (0, 255, 255)  # Bin ya lleno: cambiar de pose, distancia o luz
             cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
             
-            # Mostrar calidad
-            cv2.putText(frame, f'Q: {blur_value:.0f}', (x, y-10), 
+            # Mostrar calidad (y el bin en modo cobertura)
+            texto = f'Q: {blur_value:.0f}'
+            if bin_rostro is not None:
+                texto += f' {cobertura.etiqueta(bin_rostro)}'
+            cv2.putText(frame, texto, (x, y-10), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
         
         # Información en pantalla
@@ -162,10 +201,17 @@ def main():
         progress = (total_current * 100) // target_photos
         remaining = target_photos - total_current
         
-        cv2.putText(frame, f'TOTAL: {total_current}/{target_photos} ({progress}%)', 
-                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-        cv2.putText(frame, f'NUEVAS: {saved_photos} | FALTAN: {remaining}', 
-                   (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+        if cobertura is None:
+            cv2.putText(frame, f'TOTAL: {total_current}/{target_photos} ({progress}%)', 
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+            cv2.putText(frame, f'NUEVAS: {saved_photos} | FALTAN: {remaining}', 
+                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+        else:
+            cv2.putText(frame, f'COBERTURA: {cobertura.bins_llenos()}/{cobertura.conteo.size} bins '
+                       f'({cobertura.cobertura():.0%} de {cobertura.objetivo:.0%})', 
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+            cv2.putText(frame, f'NUEVAS: {saved_photos}', 
+                       (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
         cv2.putText(frame, 'MUEVETE CONSTANTEMENTE!', 
                    (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
         cv2.putText(frame, f'Fuente: {working_url}', 
@@ -183,7 +229,14 @@ def main():
         count += 1
         
         # Salir si alcanzamos la meta
-        if (existing_photos + saved_photos) >= target_photos:
+        if cobertura is not None:
+            if cobertura.completa():
+                print("🎯 ¡COBERTURA ALCANZADA!")
+                break
+            if cobertura.estancada(count):
+                print(f"⏹️  Sin bins nuevos en {cobertura.sin_progreso} frames - terminando")
+                break
+        elif (existing_photos + saved_photos) >= target_photos:
             print("🎯 ¡META DE 1000 FOTOS ALCANZADA!")
             break
     
@@ -201,7 +254,14 @@ def main():
     print(f"📂 Ubicación: {personPath}")
     print(f"🎥 Fuente utilizada: {working_url}")
     
-    if total_final >= 1000:
+    if cobertura is not None:
+        print(f"🧩 Cobertura: {cobertura.bins_llenos()}/{cobertura.conteo.size} bins "
+              f"({cobertura.cobertura():.0%})")
+        for linea in cobertura.resumen():
+            print(f"   {linea}")
+        if not cobertura.completa():
+            print("⚠️  Faltan bins: repite con otras distancias, giros o iluminación")
+    elif total_final >= 1000:
         print("🏆 ¡INCREÍBLE! 1000+ fotos - Entrenamiento de ÉLITE garantizado")
     elif total_final >= 800:
         print("🥇 ¡EXCELENTE! Entrenamiento muy robusto")
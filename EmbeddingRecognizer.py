@@ -0,0 +1,212 @@
+import cv2
+import os
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from FaceGallery import rangos_por_etiqueta, predecir_en_tramos, guardar_label_info, leer_label_info
+from UniformLBPH import medir_variante
+
+# Modelos SFace y YuNet de opencv_zoo (descargar y dejar junto a los scripts)
+SFACE_MODEL = 'face_recognition_sface_2021dec.onnx'
+YUNET_MODEL = 'face_detection_yunet_2023mar.onnx'
+SFACE_SIZE = (112, 112)
+
+class EmbeddingRecognizer:
+    """Reconocedor por embeddings (SFace vía cv2.dnn); misma interfaz que cv2.face
+
+    Como FaceRecognizerSF, cada rostro se alinea con los landmarks de YuNet y
+    alignCrop antes de la red. El pipeline le pasa recortes BGR con margen (ver
+    Reconocedor.recortes); las imágenes de Data/ guardadas en gris por capturas
+    antiguas se alinean igual pero siguen sin color. El umbral publicado de SFace
+    no vale para estos datos: usar el que calcula AdvancedTrainer.
+    """
+
+    # Recibe recortes en color con margen alrededor de la caja Haar
+    color = True
+
+    def __init__(self, model=SFACE_MODEL, threshold=np.inf):
+        self.model = model
+        self.threshold = threshold
+        self._net = None
+        self._detector = None
+        self._alineador = None
+        self._batch_ok = True
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+        self._labels = np.empty(0, dtype=np.int32)
+        self._rangos = {}
+        self._label_info = {}
+
+    def _red(self):
+        """Cargar la red la primera vez que se usa"""
+        if self._net is None:
+            if not os.path.exists(self.model):
+                raise FileNotFoundError(f"No se encuentra el modelo de embeddings {self.model}")
+            self._net = cv2.dnn.readNetFromONNX(self.model)
+        return self._net
+
+    def _forward(self, imgs):
+        # Mismo preprocesado que FaceRecognizerSF.feature sobre rostros ya alineados
+        blob = cv2.dnn.blobFromImages(imgs, 1.0, SFACE_SIZE, (0, 0, 0), swapRB=True, crop=False)
+        net = self._red()
+        net.setInput(blob)
+        return net.forward().reshape(len(imgs), -1)
+
+    def _alineadores(self):
+        """Detector YuNet y FaceRecognizerSF (solo por alignCrop), cargados la primera vez"""
+        if self._detector is None:
+            if not os.path.exists(YUNET_MODEL):
+                raise FileNotFoundError(f"No se encuentra el detector de landmarks {YUNET_MODEL}")
+            self._detector = cv2.FaceDetectorYN.create(YUNET_MODEL, '', (320, 320))
+            self._alineador = cv2.FaceRecognizerSF.create(self.model, '')
+        return self._detector, self._alineador
+
+    def alinear(self, face):
+        """Rostro 112x112 BGR alineado por los 5 landmarks de YuNet"""
+        bgr = cv2.cvtColor(face, cv2.COLOR_GRAY2BGR) if face.ndim == 2 else face
+        # Los recortes de Data/ van justos a la caja Haar: YuNet necesita algo de contexto
+        borde = bgr.shape[0] // 4
+        img = cv2.copyMakeBorder(bgr, borde, borde, borde, borde, cv2.BORDER_REPLICATE)
+
+        detector, alineador = self._alineadores()
+        detector.setInputSize((img.shape[1], img.shape[0]))
+        _, detecciones = detector.detect(img)
+        if detecciones is None:
+            # Sin landmarks (perfil o rostro cortado): recorte sin alinear
+            return cv2.resize(bgr, SFACE_SIZE)
+        return alineador.alignCrop(img, detecciones[np.argmax(detecciones[:, -1])])
+
+    def embed(self, faces):
+        """Embeddings L2-normalizados (float32) de un lote de rostros"""
+        imgs = [self.alinear(f) for f in faces]
+        if len(imgs) == 0:
+            return np.empty((0, self._embeddings.shape[1]), dtype=np.float32)
+
+        salida = None
+        if self._batch_ok and len(imgs) > 1:
+            try:
+                salida = self._forward(imgs)
+            except cv2.error:
+                # Algunas exportaciones ONNX fijan el lote a 1
+                self._batch_ok = False
+        if salida is None:
+            salida = np.concatenate([self._forward([img]) for img in imgs])
+
+        salida = salida.astype(np.float32)
+        salida /= np.linalg.norm(salida, axis=1, keepdims=True) + 1e-12
+        return salida
+
+    def train(self, faces, labels):
+        # Un lote a la vez para no reservar la red entera para todo el dataset
+        lotes = [self.embed(faces[i:i + 64]) for i in range(0, len(faces), 64)]
+        self._embeddings = np.concatenate(lotes)
+        self._labels = np.asarray(labels, dtype=np.int32).ravel()
+        self._indexar()
+
+    def _indexar(self):
+        """Galería ordenada por etiqueta: cada persona ocupa un tramo contiguo de filas"""
+        orden = np.argsort(self._labels, kind='stable')
+        self._embeddings = self._embeddings[orden]
+        self._labels = self._labels[orden]
+        self._rangos = rangos_por_etiqueta(self._labels)
+
+    def _distancias_tramo(self, embeddings, inicio, fin):
+        # Similitud coseno contra el tramo entero con un solo producto de matrices
+        return 1.0 - embeddings @ self._embeddings[inicio:fin].T
+
+    def predict_batch(self, faces, permitidos=None):
+        """Etiquetas y distancias coseno de todos los rostros de un frame a la vez"""
+        return predecir_en_tramos(faces, self.embed, self._distancias_tramo, self._rangos,
+                                  self._labels, self.threshold, permitidos)
+
+    def predict(self, face):
+        labels, dist = self.predict_batch([face])
+        return int(labels[0]), float(dist[0])
+
+    def getHistograms(self):
+        return self._embeddings
+
+    def getLabels(self):
+        return self._labels
+
+    def getThreshold(self):
+        return self.threshold
+
+    def setThreshold(self, threshold):
+        self.threshold = threshold
+
+    def getLabelInfo(self, label):
+        return self._label_info.get(int(label), '')
+
+    def setLabelInfo(self, label, info):
+        self._label_info[int(label)] = info
+
+    def write(self, path):
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                model=np.array(self.model),
+                threshold=np.float64(self.threshold),
+                embeddings=self._embeddings,
+                labels=self._labels,
+                **guardar_label_info(self._label_info),
+            )
+
+    def read(self, path):
+        with np.load(path) as data:
+            self.__init__(str(data['model']), float(data['threshold']))
+            self._embeddings = data['embeddings']
+            self._labels = data['labels']
+            self._label_info = leer_label_info(data)
+        self._indexar()
+
+def _medir_lote(model, X_train, y_train, X_test):
+    """Latencia por rostro prediciendo todo el holdout como un solo lote"""
+    recognizer = EmbeddingRecognizer(model)
+    recognizer.train(list(X_train), y_train)
+    t0 = time.perf_counter()
+    recognizer.predict_batch(list(X_test))
+    return (time.perf_counter() - t0) * 1000 / len(X_test)
+
+def benchmark(model=SFACE_MODEL):
+    """Comparar embeddings contra LBPH: enrolamiento, tamaño y latencia"""
+    from functools import partial
+    from AdvancedTrainer import LBPH_PARAMS, obtenerModelo, dividir_holdout
+    from FaceModels import crear_reconocedor
+
+    faces, labels, _ = obtenerModelo()
+    X_train, X_test, y_train, y_test = dividir_holdout(faces, labels)
+    y_train = np.asarray(y_train, dtype=np.int32)
+
+    variantes = [
+        ('LBPH OpenCV', partial(crear_reconocedor, 'lbph', **LBPH_PARAMS)),
+        ('LBP uniforme', partial(crear_reconocedor, 'uniform_lbph', **LBPH_PARAMS)),
+        ('Embeddings SFace', partial(crear_reconocedor, 'embedding', model=model)),
+    ]
+
+    resultados = []
+    for nombre, crear in variantes:
+        try:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                resultados.append(pool.submit(medir_variante, nombre, crear,
+                                              X_train, y_train, X_test, y_test).result())
+        except BrokenProcessPool:
+            print(f"❌ {nombre}: el proceso terminó abruptamente (¿memoria insuficiente?)")
+
+    lote_ms = _medir_lote(model, X_train, y_train, X_test)
+
+    print(f"\n📊 Enrolamiento con {len(X_train)} imágenes, {len(X_test)} rostros de prueba")
+    print(f"{'Variante':<20}{'enrolar s':>11}{'modelo MB':>11}{'ms/rostro':>11}{'precisión':>11}")
+    for r in resultados:
+        print(f"{r['nombre']:<20}{r['train_seconds']:>11.2f}{r['model_mb']:>11.2f}"
+              f"{r['predict_ms']:>11.2f}{r['accuracy']:>10.1f}%")
+    print(f"{'SFace en lote':<20}{'':>11}{'':>11}{lote_ms:>11.2f}")
+    return resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark de embeddings SFace vs. LBPH')
+    parser.add_argument('--modelo', default=SFACE_MODEL, help='Archivo ONNX de SFace')
+    args = parser.parse_args()
+    benchmark(args.modelo)
@@ -0,0 +1,55 @@
+import numpy as np
+
+def rangos_por_etiqueta(labels):
+    """Etiqueta -> (inicio, fin) de sus filas en una galería ordenada por etiqueta"""
+    valores, inicios, cuentas = np.unique(labels, return_index=True, return_counts=True)
+    return {int(v): (int(i), int(i + c)) for v, i, c in zip(valores, inicios, cuentas)}
+
+def tramos_permitidos(rangos, permitidos=None):
+    """Tramos contiguos de la galería que pertenecen a las etiquetas permitidas (None = todas)"""
+    if permitidos is None:
+        total = max((fin for _, fin in rangos.values()), default=0)
+        return [(0, total)] if total else []
+    tramos = []
+    for inicio, fin in sorted(rangos[int(l)] for l in permitidos if int(l) in rangos):
+        if tramos and tramos[-1][1] == inicio:
+            tramos[-1] = (tramos[-1][0], fin)
+        else:
+            tramos.append((inicio, fin))
+    return tramos
+
+def guardar_label_info(label_info):
+    """Arrays para np.savez con el nombre de cada etiqueta"""
+    return {
+        'label_info_labels': np.array(list(label_info), dtype=np.int32),
+        'label_info_names': np.array(list(label_info.values()), dtype=str),
+    }
+
+def leer_label_info(data):
+    """Etiqueta -> nombre de un .npz (vacío en modelos guardados sin nombres)"""
+    if 'label_info_labels' not in data.files:
+        return {}
+    return {int(l): str(n) for l, n in zip(data['label_info_labels'], data['label_info_names'])}
+
+def predecir_en_tramos(faces, consultas, distancias, rangos, labels, threshold, permitidos=None):
+    """Vecino más cercano de cada rostro buscando solo en los tramos de las etiquetas permitidas
+
+    consultas(faces) extrae los vectores del lote una vez; distancias(q, inicio, fin)
+    devuelve la matriz rostros x imágenes del tramo [inicio, fin) de la galería.
+    """
+    pred = np.full(len(faces), -1, dtype=np.int32)
+    dist = np.full(len(faces), np.finfo(np.float64).max)
+    tramos = tramos_permitidos(rangos, permitidos)
+    if len(faces) == 0 or not tramos:
+        return pred, dist
+
+    q = consultas(faces)
+    filas = np.arange(len(faces))
+    for inicio, fin in tramos:
+        d = distancias(q, inicio, fin)
+        mejores = np.argmin(d, axis=1)
+        cercanas = d[filas, mejores]
+        aceptados = (cercanas < threshold) & (cercanas < dist)
+        pred[aceptados] = labels[inicio + mejores[aceptados]]
+        dist[aceptados] = cercanas[aceptados]
+    return pred, dist
@@ -0,0 +1,261 @@
+import cv2
+import os
+import re
+import numpy as np
+import xml.etree.ElementTree as ET
+
+from FaceGallery import rangos_por_etiqueta, predecir_en_tramos
+from UniformLBPH import UniformLBPHRecognizer, codigos_lbp, histograma_espacial_disperso
+from EmbeddingRecognizer import EmbeddingRecognizer
+
+# Archivo de modelo por defecto de cada tipo de reconocedor
+MODEL_PATHS = {
+    'lbph': 'FacesModel.xml',
+    'uniform_lbph': 'FacesModel.npz',
+    'embedding': 'FacesModel_embeddings.npz',
+}
+
+CONFIG_PATH = 'model_config.txt'
+
+# Personas autorizadas en cada puerta: una línea puerta=nombre1,nombre2
+PUERTAS_PATH = 'puertas.txt'
+
+BLOQUE_GALERIA = 256  # Imágenes comparadas a la vez: acota la memoria de trabajo por consulta
+
+def crear_reconocedor(tipo='lbph', **params):
+    """Crear un reconocedor vacío del tipo indicado"""
+    if tipo == 'lbph':
+        return cv2.face.LBPHFaceRecognizer_create(**params)
+    if tipo == 'uniform_lbph':
+        return UniformLBPHRecognizer(**params)
+    if tipo == 'embedding':
+        return EmbeddingRecognizer(**params)
+    raise ValueError(f"Tipo de reconocedor desconocido: {tipo}")
+
+def cargar_config(path=CONFIG_PATH):
+    """Leer model_config.txt como diccionario clave -> texto"""
+    config = {}
+    if not os.path.exists(path):
+        return config
+    with open(path, 'r') as f:
+        for line in f:
+            if '=' in line:
+                key, value = line.split('=', 1)
+                config[key.strip()] = value.strip()
+    return config
+
+def guardar_config(config, path=CONFIG_PATH):
+    """Escribir el diccionario de configuración en formato clave=valor"""
+    with open(path, 'w') as f:
+        for key, value in config.items():
+            f.write(f"{key}={value}\n")
+
+def cargar_puertas(path=PUERTAS_PATH):
+    """Puerta -> lista de nombres autorizados"""
+    return {puerta: [n.strip() for n in nombres.split(',') if n.strip()]
+            for puerta, nombres in cargar_config(path).items()}
+
+def ruta_modelo(config):
+    """Archivo del modelo indicado en la configuración"""
+    tipo = config.get('recognizer', 'lbph')
+    return config.get('model_path', MODEL_PATHS[tipo])
+
+def umbral_config(config, defecto_lbph):
+    """Umbral de aceptación de la configuración, en la escala de su reconocedor"""
+    if 'recommended_threshold' in config:
+        return float(config['recommended_threshold'])
+    tipo = config.get('recognizer', 'lbph')
+    if tipo == 'lbph':
+        return float(defecto_lbph)
+    # Un umbral de LBPH aceptaría a cualquiera con distancias coseno o de LBP uniforme:
+    # sin umbral propio del reconocedor no se acepta a nadie
+    return 0.0
+
+def cargar_reconocedor(config):
+    """Crear el reconocedor indicado en la configuración y cargar su modelo"""
+    recognizer = crear_reconocedor(config.get('recognizer', 'lbph'))
+    recognizer.read(ruta_modelo(config))
+    return recognizer
+
+def parametros_modelo(config):
+    """Parámetros con los que se entrenó el modelo de la configuración, sin cargar la galería"""
+    tipo = config.get('recognizer', 'lbph')
+    path = ruta_modelo(config)
+    if not os.path.exists(path):
+        return None
+
+    if tipo == 'lbph':
+        # cv2.face escribe los parámetros antes de los histogramas
+        params = {}
+        with open(path, 'r') as f:
+            for linea in f:
+                m = re.match(r'\s*<(radius|neighbors|grid_x|grid_y)>(\d+)<', linea)
+                if m:
+                    params[m.group(1)] = int(m.group(2))
+                if len(params) == 4 or '<histograms>' in linea:
+                    break
+        if len(params) < 4:
+            # Otro formato de FileStorage: cargar el modelo entero para leerlos
+            recognizer = cargar_reconocedor(config)
+            params = dict(radius=recognizer.getRadius(), neighbors=recognizer.getNeighbors(),
+                          grid_x=recognizer.getGridX(), grid_y=recognizer.getGridY())
+        return params
+
+    # np.load solo lee del .npz los arrays que se piden
+    with np.load(path) as data:
+        if tipo == 'uniform_lbph':
+            radius, neighbors, grid_x, grid_y, rotation_invariant = data['params'].tolist()
+            return dict(radius=radius, neighbors=neighbors, grid_x=grid_x, grid_y=grid_y,
+                        rotation_invariant=bool(rotation_invariant))
+        return dict(model=str(data['model']))
+
+def guardar_nombres(recognizer, nombres):
+    """Guardar en el modelo el nombre de cada etiqueta (etiqueta = posición en nombres)"""
+    for label, nombre in enumerate(nombres):
+        recognizer.setLabelInfo(label, nombre)
+
+def nombres_modelo(recognizer):
+    """Etiqueta -> nombre guardado con el modelo (vacío en modelos entrenados sin nombres)"""
+    nombres = {}
+    for label in np.unique(np.asarray(recognizer.getLabels()).ravel()):
+        nombre = recognizer.getLabelInfo(int(label))
+        if nombre:
+            nombres[int(label)] = nombre
+    return nombres
+
+def _leer_etiquetas_xml(path):
+    """Etiquetas y nombres de un modelo LBPH de cv2.face sin leer sus histogramas"""
+    # cv2.face escribe labels y labelsInfo después de los histogramas: leer solo la cola
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        tam = f.tell()
+        cola = 1 << 20
+        while True:
+            f.seek(max(0, tam - cola))
+            texto = f.read()
+            inicio = texto.rfind(b'<labels ')
+            if inicio >= 0 or cola >= tam:
+                break
+            cola *= 4
+    if inicio < 0:
+        raise ValueError(f"{path} no es un modelo LBPH de cv2.face en XML")
+
+    fin = texto.rfind(b'</opencv_lbphfaces>')
+    nodo = ET.fromstring(b'<cola>' + texto[inicio:fin] + b'</cola>')
+    labels = np.fromstring(nodo.findtext('labels/data'), dtype=np.int32, sep=' ')
+    nombres = {int(info.findtext('label')): (info.findtext('value') or '').strip('"')
+               for info in nodo.iterfind('labelsInfo/_')}
+    return labels, nombres
+
+class GaleriaLBPH:
+    """Histogramas de un LBPH de OpenCV en numpy, para comparar solo con etiquetas permitidas"""
+
+    def __init__(self, path):
+        labels, self._label_info = _leer_etiquetas_xml(path)
+        orden = np.argsort(labels, kind='stable')
+        columna = np.empty(len(labels), dtype=np.int64)
+        columna[orden] = np.arange(len(labels))
+        self._labels = labels[orden]
+        self._rangos = rangos_por_etiqueta(self._labels)
+
+        # Leer el XML en streaming en vez de cargarlo con cv2.face: cada histograma va
+        # directo a su columna y no hay una segunda copia de la galería en memoria
+        params = {}
+        self._galeria = None
+        i = 0
+        with open(path, 'rb') as f:
+            for evento, elem in ET.iterparse(f, events=('start', 'end')):
+                if evento == 'start':
+                    if elem.tag == 'histograms':
+                        histogramas = elem
+                elif elem.tag in ('threshold', 'radius', 'neighbors', 'grid_x', 'grid_y'):
+                    params[elem.tag] = float(elem.text)
+                elif elem.tag == 'data':
+                    hist = np.fromstring(elem.text, dtype=np.float32, sep=' ')
+                    if self._galeria is None:
+                        # Una columna contigua (orden Fortran) por imagen, ordenadas por etiqueta:
+                        # los bins activos de una consulta son filas y cada persona un tramo de columnas
+                        self._galeria = np.empty((hist.size, len(labels)), dtype=np.float32, order='F')
+                    self._galeria[:, columna[i]] = hist
+                    i += 1
+                    histogramas.clear()  # Soltar el texto ya leído
+                elif elem.tag == 'histograms':
+                    break
+        if i == 0 or i != len(labels):
+            raise ValueError(f"{path}: {i} histogramas para {len(labels)} etiquetas")
+
+        self._sumas = self._galeria.sum(axis=0)
+        self.threshold = params['threshold']
+        self._radius = int(params['radius'])
+        self._neighbors = int(params['neighbors'])
+        self._grid = (int(params['grid_x']), int(params['grid_y']))
+        self._trabajo = np.empty(0, dtype=np.float32)
+
+    def extraer(self, face):
+        """Bins activos y valores del histograma que calcularía cv2.face, sin el vector denso"""
+        codes = codigos_lbp(face, self._radius, self._neighbors)
+        return histograma_espacial_disperso(codes, 1 << self._neighbors, *self._grid)
+
+    def _buffers(self, filas, columnas):
+        """Dos matrices de trabajo filas x columnas sobre un mismo buffer reutilizado"""
+        n = filas * columnas
+        if self._trabajo.size < 2 * n:
+            self._trabajo = np.empty(2 * n, dtype=np.float32)
+        return self._trabajo[:n].reshape(filas, columnas), self._trabajo[n:2 * n].reshape(filas, columnas)
+
+    def _distancias_tramo(self, consultas, inicio, fin):
+        """Chi-cuadrado (como cv2.face) usando solo los bins activos de cada consulta"""
+        d = np.empty((len(consultas), fin - inicio), dtype=np.float64)
+        for k, (activos, q) in enumerate(consultas):
+            q_suma = q.sum()
+            q = q[:, None]
+            # Por bloques de imágenes, en buffers reutilizados y con operaciones in situ
+            for a in range(inicio, fin, BLOQUE_GALERIA):
+                b = min(a + BLOQUE_GALERIA, fin)
+                g, suma = self._buffers(len(activos), b - a)
+                np.take(self._galeria[:, a:b], activos, axis=0, out=g, mode='clip')
+                np.add(g, q, out=suma)
+                np.multiply(g, q, out=g)
+                np.divide(g, suma, out=g)
+                d[k, a - inicio:b - inicio] = 2.0 * (self._sumas[a:b] + q_suma - 4.0 * g.sum(axis=0))
+        return d
+
+    def predict_batch(self, faces, permitidos=None):
+        """Etiquetas y distancias de un lote, comparando solo con las etiquetas permitidas"""
+        return predecir_en_tramos(faces, lambda fs: [self.extraer(f) for f in fs],
+                                  self._distancias_tramo, self._rangos, self._labels,
+                                  self.threshold, permitidos)
+
+    def predict(self, face):
+        labels, dist = self.predict_batch([face])
+        return int(labels[0]), float(dist[0])
+
+    def getLabels(self):
+        return self._labels
+
+    def getLabelInfo(self, label):
+        return self._label_info.get(int(label), '')
+
+    def getThreshold(self):
+        return self.threshold
+
+    def setThreshold(self, threshold):
+        self.threshold = threshold
+
+def cargar_galeria(config):
+    """Cargar el modelo de la configuración como galería que admite etiquetas permitidas"""
+    if config.get('recognizer', 'lbph') == 'lbph':
+        return GaleriaLBPH(ruta_modelo(config))
+    return cargar_reconocedor(config)
+
+def predecir_lote(recognizer, rostros, permitidos=None):
+    """Predecir todos los rostros de un frame (en lote si el reconocedor lo permite)"""
+    if hasattr(recognizer, 'predict_batch'):
+        return recognizer.predict_batch(rostros, permitidos)
+    if permitidos is not None:
+        raise ValueError("Este reconocedor no filtra por etiquetas; usar cargar_galeria()")
+    labels = np.empty(len(rostros), dtype=np.int32)
+    dist = np.empty(len(rostros), dtype=np.float64)
+    for i, rostro in enumerate(rostros):
+        labels[i], dist[i] = recognizer.predict(rostro)
+    return labels, dist
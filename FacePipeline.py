@@ -0,0 +1,132 @@
+import cv2
+import os
+import numpy as np
+
+from FaceModels import (PUERTAS_PATH, cargar_config, cargar_puertas, cargar_galeria,
+                        nombres_modelo, predecir_lote, umbral_config)
+
+# Parámetros de detección del sistema integrado
+DETECTION_PARAMS = dict(
+    scaleFactor=1.4,
+    minNeighbors=8,
+    minSize=(120, 120),
+    maxSize=(250, 250),
+)
+
+FACE_SIZE = (150, 150)
+MARGEN_COLOR = 0.25  # Contexto alrededor de la caja Haar para buscar landmarks
+DEFAULT_THRESHOLD = 3000  # Solo para LBPH de OpenCV
+
+def cargar_detector():
+    """Clasificador Haar de rostros frontales"""
+    ruta = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+    if not os.path.exists(ruta):
+        # Algunas instalaciones de OpenCV no traen los XML; usar la copia del repositorio
+        ruta = 'haarcascade_frontalface_default.xml'
+    return cv2.CascadeClassifier(ruta)
+
+def nombres_personas(dataPath='Data'):
+    """Nombres de las carpetas de Data (modelos antiguos que no guardan los nombres)"""
+    return os.listdir(dataPath) if os.path.exists(dataPath) else []
+
+def detectar_rostros(detector, gray, params=DETECTION_PARAMS):
+    """Cajas (x, y, w, h) de los rostros de un frame en escala de grises"""
+    faces = detector.detectMultiScale(gray, **params)
+    return np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+
+def recortar_rostros(gray, faces, pool=None):
+    """Recortes normalizados a 150x150 para el reconocedor (en buffers del pool si se da)"""
+    rostros = []
+    for i, (x, y, w, h) in enumerate(faces):
+        dst = pool.get(('rostro', i), FACE_SIZE) if pool is not None else None
+        rostros.append(cv2.resize(gray[y:y + h, x:x + w], FACE_SIZE, dst=dst,
+                                  interpolation=cv2.INTER_CUBIC))
+    return rostros
+
+def recortar_rostros_color(frame, faces, margen=MARGEN_COLOR):
+    """Vistas BGR de cada caja con margen, para reconocedores que alinean por landmarks"""
+    alto, ancho = frame.shape[:2]
+    rostros = []
+    for x, y, w, h in faces:
+        mx, my = int(w * margen), int(h * margen)
+        rostros.append(frame[max(0, y - my):min(alto, y + h + my), max(0, x - mx):min(ancho, x + w + mx)])
+    return rostros
+
+class Reconocedor:
+    """Modelo, umbral y nombres cargados una vez para detectar y reconocer"""
+
+    def __init__(self, config=None, puerta=None):
+        self.config = cargar_config() if config is None else config
+        # Una sola galería en memoria para todas las puertas
+        self.recognizer = cargar_galeria(self.config)
+        self.threshold = umbral_config(self.config, DEFAULT_THRESHOLD)
+        self.detector = cargar_detector()
+        self.names = nombres_modelo(self.recognizer) or dict(enumerate(nombres_personas()))
+        self.puerta = puerta
+        self._permitidos = {}
+        if puerta is not None:
+            self.etiquetas_permitidas(puerta)
+
+    def comprobar_puertas(self):
+        """Resolver todas las listas de puertas.txt (ValueError si nombran a alguien que no está en el modelo)"""
+        for puerta in cargar_puertas():
+            self.etiquetas_permitidas(puerta)
+
+    def recortes(self, frame, gray, faces, pool=None):
+        """Recortes en el formato del reconocedor: 150x150 en gris, o en color con margen"""
+        if getattr(self.recognizer, 'color', False):
+            return recortar_rostros_color(frame, faces)
+        return recortar_rostros(gray, faces, pool)
+
+    def liberar_galeria(self):
+        """Soltar la galería cuando se reconoce en otros procesos (nombres y puertas se conservan)"""
+        self.etiquetas_permitidas(self.puerta)
+        self.recognizer = None
+
+    def etiquetas_permitidas(self, puerta):
+        """Etiquetas autorizadas en una puerta según puertas.txt (None = todas)"""
+        if puerta is None:
+            return None
+        if puerta not in self._permitidos:
+            puertas = cargar_puertas()
+            if puerta not in puertas:
+                raise ValueError(f"Puerta desconocida en {PUERTAS_PATH}: {puerta}")
+            etiquetas = {nombre: label for label, nombre in self.names.items()}
+            # Un nombre mal escrito dejaría una puerta que rechaza a todos sin avisar
+            desconocidos = [n for n in puertas[puerta] if n not in etiquetas]
+            if desconocidos:
+                raise ValueError(f"Personas de la puerta {puerta} en {PUERTAS_PATH} que no están "
+                                 f"en el modelo: {', '.join(desconocidos)}")
+            self._permitidos[puerta] = np.array(
+                sorted(etiquetas[n] for n in puertas[puerta]), dtype=np.int32)
+        return self._permitidos[puerta]
+
+    def identificar(self, rostros, puerta=None):
+        """Nombre (o None), distancia y si se acepta, para cada recorte"""
+        # Las personas no autorizadas en la puerta ni siquiera se comparan
+        permitidos = self.etiquetas_permitidas(self.puerta if puerta is None else puerta)
+        labels, dist = predecir_lote(self.recognizer, rostros, permitidos)
+        resultados = []
+        for label, d in zip(labels, dist):
+            aceptado = bool(d < self.threshold and label in self.names)
+            resultados.append({
+                'name': self.names[label] if aceptado else None,
+                'label': int(label),
+                'distance': float(d),
+                'accepted': aceptado,
+            })
+        return resultados
+
+# Reconocedor cargado una sola vez en cada proceso de trabajo
+_reconocedor_worker = None
+
+def iniciar_worker(comprobar_puertas=False):
+    """Cargar modelo, detector y nombres en el proceso de trabajo (initializer del pool)"""
+    global _reconocedor_worker
+    _reconocedor_worker = Reconocedor()
+    if comprobar_puertas:
+        _reconocedor_worker.comprobar_puertas()
+
+def reconocedor_worker():
+    """Reconocedor del proceso de trabajo actual"""
+    return _reconocedor_worker
@@ -1,19 +1,20 @@
 import cv2
 import os
 
+from FaceModels import (cargar_config, cargar_reconocedor, ruta_modelo, predecir_lote, nombres_modelo,
+                        umbral_config)
+from FacePipeline import recortar_rostros_color
+
 # Usar ruta relativa
 dataPath = 'Data'
 if not os.path.exists(dataPath):
     print(f"Error: La carpeta {dataPath} no existe")
     exit()
 
-imagePaths = os.listdir(dataPath)
-
 def main():
-    print('Personas en base de datos:', imagePaths)
-
     # Verificar si existe el modelo entrenado
-    model_path = 'FacesModel.xml'
+    config = cargar_config()
+    model_path = ruta_modelo(config)
     if not os.path.exists(model_path):
         print(f"Error: No se encuentra el archivo {model_path}")
         print("Primero ejecuta TrainModel.py para entrenar el modelo")
@@ -21,9 +22,16 @@ def main():
 
     try:
         # Crear el reconocedor de caras y cargar el modelo preentrenado
-        face_recognizer = cv2.face.LBPHFaceRecognizer_create()
-        face_recognizer.read(model_path)
+        face_recognizer = cargar_reconocedor(config)
         print("Modelo cargado exitosamente")
+        # Nombres guardados con el modelo; los modelos antiguos usan el orden de Data/
+        names = nombres_modelo(face_recognizer) or dict(enumerate(os.listdir(dataPath)))
+        print('Personas en base de datos:', list(names.values()))
+        # El umbral depende del reconocedor; 7000 es el de LBPH por defecto
+        threshold = umbral_config(config, 7000)
+        if threshold <= 0:
+            print("⚠️ Sin umbral calibrado para este reconocedor: se rechazarán todos los rostros")
+            print("   Ejecuta AdvancedTrainer.py con el mismo --reconocedor para calcularlo")
     except Exception as e:
         print(f"Error al cargar el modelo: {e}")
         return
@@ -86,23 +94,27 @@ def main():
 
         print(f"DEBUG: Rostros detectados: {len(faces)}")  # Debug en consola
 
-        for (x, y, w, h) in faces:
-            # Extraer el rostro detectado
-            rostro = gray[y:y + h, x:x + w]
-            rostro = cv2.resize(rostro, (150, 150), interpolation=cv2.INTER_CUBIC)
+        # Extraer los rostros detectados
+        if getattr(face_recognizer, 'color', False):
+            # Los embeddings alinean por landmarks sobre el recorte en color
+            rostros = recortar_rostros_color(frame, faces)
+        else:
+            rostros = [
+                cv2.resize(gray[y:y + h, x:x + w], (150, 150), interpolation=cv2.INTER_CUBIC)
+                for (x, y, w, h) in faces
+            ]
 
-            # Predecir el rostro detectado usando el modelo entrenado
-            result = face_recognizer.predict(rostro)
-            confidence = result[1]
-            predicted_person = result[0]
-            
+        # Predecir todos los rostros del frame usando el modelo entrenado
+        predicciones = zip(*predecir_lote(face_recognizer, rostros))
+
+        for (x, y, w, h), (predicted_person, confidence) in zip(faces, predicciones):
             print(f"DEBUG: Confianza: {confidence:.1f}, Persona: {predicted_person}")
             
             # LÓGICA PRINCIPAL: Determinar si es autorizado o no
             # Umbral ajustado para ser más preciso
-            if confidence < 7000 and predicted_person < len(imagePaths):
+            if confidence < threshold and predicted_person in names:
                 # ES LA PERSONA AUTORIZADA (nicol)
-                person_name = imagePaths[predicted_person]
+                person_name = names[predicted_person]
                 
                 # TEXTO Y RECTANGULO VERDE
                 cv2.putText(frame, 'ROSTRO DETECTADO', (x, y - 30), 
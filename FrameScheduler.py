@@ -0,0 +1,137 @@
+import cv2
+import time
+import numpy as np
+
+from FacePipeline import DETECTION_PARAMS
+
+LATENCIA_OBJETIVO_MS = 80
+MAX_ROSTROS = 3
+
+# Niveles de degradación: detectar sobre una imagen reducida, con menos exigencia, y saltar frames
+NIVELES = [
+    dict(escala=1.0, scaleFactor=1.4, minNeighbors=8, saltar=1),
+    dict(escala=0.75, scaleFactor=1.4, minNeighbors=6, saltar=1),
+    dict(escala=0.5, scaleFactor=1.5, minNeighbors=5, saltar=1),
+    dict(escala=0.5, scaleFactor=1.5, minNeighbors=5, saltar=2),
+    dict(escala=0.5, scaleFactor=1.5, minNeighbors=5, saltar=3),
+]
+
+class PlanificadorFrames:
+    """Detección y reconocimiento con presupuesto de latencia por frame"""
+
+    def __init__(self, reconocedor, objetivo_ms=LATENCIA_OBJETIVO_MS, max_rostros=MAX_ROSTROS,
+                 subir_tras=5, bajar_tras=30):
+        self.reconocedor = reconocedor
+        self.objetivo = objetivo_ms / 1000
+        self.max_rostros = max_rostros
+        self.subir_tras = subir_tras
+        self.bajar_tras = bajar_tras
+        self.nivel = 0
+        self._frames_en_nivel = 0
+        self._frame = 0
+
+        # Promedios móviles de la latencia de un frame procesado y de reconocer un rostro (por rostro del lote)
+        self.latencia = 0.0
+        self.costo_rostro = 0.0
+        self.presupuesto_restante = self.objetivo
+
+        self.frames = 0
+        self.frames_saltados = 0
+        self.rostros_omitidos = 0
+        self.paradas_tempranas = 0
+
+    def _detectar(self, gray, pool):
+        """Cajas en coordenadas de gray, detectando sobre una copia reducida si el nivel lo pide"""
+        nivel = NIVELES[self.nivel]
+        escala = nivel['escala']
+        params = dict(DETECTION_PARAMS, scaleFactor=nivel['scaleFactor'],
+                      minNeighbors=nivel['minNeighbors'])
+        if escala < 1.0:
+            tam = (round(gray.shape[1] * escala), round(gray.shape[0] * escala))
+            gray = cv2.resize(gray, tam, dst=pool.get('gray_reducido', tam[::-1]),
+                              interpolation=cv2.INTER_AREA)
+            params['minSize'] = tuple(round(v * escala) for v in params['minSize'])
+            params['maxSize'] = tuple(round(v * escala) for v in params['maxSize'])
+
+        faces = self.reconocedor.detector.detectMultiScale(gray, **params)
+        faces = np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+        if escala < 1.0:
+            faces = np.round(faces / escala).astype(np.int32)
+        return faces
+
+    def procesar(self, frame, pool):
+        """(faces, identidades) del frame, o None si el nivel actual lo salta"""
+        self.frames += 1
+        self._frame += 1
+        if self._frame % NIVELES[self.nivel]['saltar']:
+            self.frames_saltados += 1
+            return None
+
+        inicio = time.perf_counter()
+        limite = inicio + self.objetivo
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pool.get('gray', frame.shape[:2]))
+        faces = self._detectar(gray, pool)
+
+        # Los rostros más grandes primero (los más cercanos a la puerta)
+        if len(faces):
+            faces = faces[np.argsort(-(faces[:, 2] * faces[:, 3]), kind='stable')]
+        omitidos = max(0, len(faces) - self.max_rostros)
+        faces = faces[:self.max_rostros]
+
+        # Todos los rostros que caben en el presupuesto se reconocen en una sola llamada
+        identidades = []
+        while len(identidades) < len(faces):
+            if any(identidad['accepted'] for identidad in identidades):
+                # Con un rostro autorizado confirmado ya se decide el acceso
+                self.paradas_tempranas += 1
+                break
+            caben = self._rostros_que_caben(limite, len(faces) - len(identidades))
+            # Siempre se evalúa al menos un rostro
+            if identidades and caben == 0:
+                break
+            lote = faces[len(identidades):len(identidades) + max(caben, 1)]
+            t0 = time.perf_counter()
+            identidades += self.reconocedor.identificar(self.reconocedor.recortes(frame, gray, lote, pool))
+            self.costo_rostro = self._promedio(self.costo_rostro, (time.perf_counter() - t0) / len(lote))
+        self.rostros_omitidos += omitidos + len(faces) - len(identidades)
+
+        fin = time.perf_counter()
+        self.presupuesto_restante = limite - fin
+        self.latencia = self._promedio(self.latencia, fin - inicio)
+        self._ajustar_nivel()
+        return faces[:len(identidades)], identidades
+
+    def _rostros_que_caben(self, limite, pendientes):
+        """Cuántos de los rostros pendientes caben en lo que queda del presupuesto"""
+        if self.costo_rostro == 0:
+            return pendientes
+        return min(pendientes, max(0, int((limite - time.perf_counter()) / self.costo_rostro)))
+
+    @staticmethod
+    def _promedio(actual, nuevo, alfa=0.2):
+        return nuevo if actual == 0 else (1 - alfa) * actual + alfa * nuevo
+
+    def _ajustar_nivel(self):
+        """Subir o bajar el nivel de degradación según la latencia media por frame de cámara"""
+        self._frames_en_nivel += 1
+        costo = self.latencia / NIVELES[self.nivel]['saltar']
+        if (costo > self.objetivo and self.nivel < len(NIVELES) - 1
+                and self._frames_en_nivel >= self.subir_tras):
+            self.nivel += 1
+            self._frames_en_nivel = 0
+        elif (costo < 0.6 * self.objetivo and self.nivel > 0
+              and self._frames_en_nivel >= self.bajar_tras):
+            self.nivel -= 1
+            self._frames_en_nivel = 0
+
+    def metricas(self):
+        return {
+            'target_ms': round(self.objetivo * 1000, 1),
+            'latency_ms': round(self.latencia * 1000, 1),
+            'budget_left_ms': round(self.presupuesto_restante * 1000, 1),
+            'level': self.nivel,
+            'frames': self.frames,
+            'skipped_frames': self.frames_saltados,
+            'skipped_faces': self.rostros_omitidos,
+            'early_stops': self.paradas_tempranas,
+        }
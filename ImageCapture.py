@@ -1,6 +1,8 @@
 import cv2
 import os
 
+from BufferPool import BufferPool
+
 # Crear carpeta Data si no existe
 dataPath = 'Data'
 if not os.path.exists(dataPath):
@@ -26,23 +28,27 @@ faceClassif = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontal
 count = 0
 max_photos = 300
 
+# Buffers reutilizados en cada frame
+pool = BufferPool()
+
 print(f"Capturando fotos de {personName}")
 print("Presiona ESPACIO para capturar, ESC para salir")
 
+frame = None
 while True:
-    ret, frame = cap.read()
+    ret, frame = cap.read(frame)
     if not ret:
         break
     
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    auxFrame = gray.copy()
+    # Los rectángulos se dibujan en frame, así que gray no necesita copia
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pool.get('gray', frame.shape[:2]))
     
     faces = faceClassif.detectMultiScale(gray, 1.3, 5)
     
     for (x, y, w, h) in faces:
-        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        rostro = auxFrame[y:y + h, x:x + w]
-        rostro = cv2.resize(rostro, (150, 150), interpolation=cv2.INTER_CUBIC)
+        # Recorte en color (los entrenadores LBPH lo leen en gris); se dibuja después
+        rostro = cv2.resize(frame[y:y + h, x:x + w], (150, 150), dst=pool.get('rostro', (150, 150, 3)),
+                            interpolation=cv2.INTER_CUBIC)
         
         # Capturar automáticamente cada 10 frames
         if count % 10 == 0:
@@ -51,6 +57,9 @@ while True:
         
         count += 1
     
+    for (x, y, w, h) in faces:
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+    
     cv2.putText(frame, f"Fotos: {count}/{max_photos}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
     cv2.imshow('Capturando rostros', frame)
     
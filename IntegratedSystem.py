@@ -4,9 +4,17 @@ import serial
 import time
 import serial.tools.list_ports
 
+from FaceModels import cargar_config, ruta_modelo
+from FacePipeline import Reconocedor, cargar_detector
+from BufferPool import BufferPool
+from SharedFrameRing import ReconocimientoMultiproceso
+from FrameScheduler import PlanificadorFrames
+
 # Configuración del sistema
-dataPath = 'Data'
-imagePaths = os.listdir(dataPath) if os.path.exists(dataPath) else []
+PUERTA = None  # Nombre de esta puerta en puertas.txt (None = todas las personas del modelo)
+DEBUG_BUFFERS = False  # Reportar asignaciones y RSS cada 100 frames
+PROCESOS_RECONOCIMIENTO = 0  # >0: reconocer en procesos aparte leyendo frames de memoria compartida
+LATENCIA_OBJETIVO_MS = 80  # Presupuesto por frame del planificador (0 = todos los rostros, parámetros fijos)
 
 def find_arduino_port():
     """Encuentra automáticamente el puerto del Arduino"""
@@ -90,34 +98,33 @@ def main():
     print("="*70)
     
     # Verificar modelo entrenado
-    model_path = 'FacesModel.xml'
+    config = cargar_config()
+    model_path = ruta_modelo(config)
     if not os.path.exists(model_path):
-        print("❌ Error: No se encuentra FacesModel.xml")
+        print(f"❌ Error: No se encuentra {model_path}")
         print("Ejecuta primero: python TrainModel.py")
         return
     
-    # Cargar configuración del modelo
-    recommended_threshold = 3000  # Default
-    try:
-        with open('model_config.txt', 'r') as f:
-            for line in f:
-                if line.startswith('recommended_threshold='):
-                    recommended_threshold = int(line.split('=')[1].strip())
-                    break
-        print(f"✅ Usando umbral recomendado: {recommended_threshold}")
-    except:
-        print(f"⚠️ Usando umbral por defecto: {recommended_threshold}")
-    
-    # Cargar modelo de reconocimiento
+    # Cargar modelo de reconocimiento y su configuración
     try:
-        face_recognizer = cv2.face.LBPHFaceRecognizer_create()
-        face_recognizer.read(model_path)
-        print("✅ Modelo de reconocimiento cargado")
-        print(f"✅ Personas en base de datos: {imagePaths}")
+        reconocedor = Reconocedor(config, PUERTA)
+        print(f"✅ Modelo de reconocimiento cargado ({config.get('recognizer', 'lbph')})")
+        print(f"✅ Personas en base de datos: {list(reconocedor.names.values())}")
+        if PUERTA is not None:
+            autorizados = [reconocedor.names[l] for l in reconocedor.etiquetas_permitidas(PUERTA)]
+            print(f"🚪 Puerta {PUERTA}: autorizados {autorizados}")
     except Exception as e:
         print(f"❌ Error cargando modelo: {e}")
         return
     
+    if 'recommended_threshold' in config:
+        print(f"✅ Usando umbral recomendado: {reconocedor.threshold}")
+    elif reconocedor.threshold <= 0:
+        print(f"⚠️ Sin umbral calibrado para {config.get('recognizer')}: se rechazarán todos los rostros")
+        print("   Ejecuta AdvancedTrainer.py con el mismo --reconocedor para calcularlo")
+    else:
+        print(f"⚠️ Usando umbral por defecto: {reconocedor.threshold}")
+    
     # Conectar a ESP32-CAM
     esp32_urls = [
         'http://192.168.88.12:81/stream',
@@ -158,7 +165,7 @@ def main():
         print("⚠️  Continuando sin Arduino (solo reconocimiento en PC)")
     
     # Cargar detector de rostros
-    faceClassif = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    faceClassif = cargar_detector()
     
     print("\n" + "="*70)
     print("🎥 SISTEMA DE RECONOCIMIENTO ACTIVO")
@@ -173,49 +180,80 @@ def main():
     stable_count = 0
     required_stability = 10  # CAMBIADO: Era 5, ahora 10 frames para más estabilidad
     
+    # Buffers reutilizados en cada frame (sin asignaciones en régimen estable)
+    pool = BufferPool(debug=DEBUG_BUFFERS)
+    captura = None
+    
+    # Reconocimiento en otros procesos (se crea al conocer el tamaño del frame)
+    multiproceso = None
+    if PROCESOS_RECONOCIMIENTO > 0:
+        # Cada proceso de reconocimiento carga su galería: no guardar otra aquí
+        reconocedor.liberar_galeria()
+    # Planificador: rostros más grandes primero, parada temprana y detección adaptativa
+    planificador = None
+    if LATENCIA_OBJETIVO_MS > 0 and PROCESOS_RECONOCIMIENTO == 0:
+        planificador = PlanificadorFrames(reconocedor, LATENCIA_OBJETIVO_MS)
+    faces, identidades = [], []
+    
     while True:
-        ret, frame = cap.read()
+        ret, captura = cap.read(captura)
         if not ret:
             print("❌ Error capturando video desde ESP32-CAM")
             break
         
         # VOLTEAR LA IMAGEN SI ESTÁ AL REVÉS
         # Opciones de rotación/volteo:
-        frame = cv2.flip(frame, -1)  # Voltear horizontal y vertical (180°)
+        frame = cv2.flip(captura, -1, dst=pool.get('frame', captura.shape))  # Voltear horizontal y vertical (180°)
         # frame = cv2.flip(frame, 0)   # Solo voltear vertical
         # frame = cv2.flip(frame, 1)   # Solo voltear horizontal
         # frame = cv2.rotate(frame, cv2.ROTATE_180)  # Rotar 180°
         
-        # Convertir a escala de grises
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Detectar rostros - PARÁMETROS MUY ESTRICTOS
-        faces = faceClassif.detectMultiScale(
-            gray, 
-            scaleFactor=1.4,      # CAMBIADO: Menos sensible (era 1.3)
-            minNeighbors=8,       # CAMBIADO: Más estricto (era 6)
-            minSize=(120, 120),   # CAMBIADO: Rostros más grandes (era 100)
-            maxSize=(250, 250)    # CAMBIADO: Rango más pequeño (era 300)
-        )
+        nuevo_resultado = True
+        if PROCESOS_RECONOCIMIENTO > 0:
+            if multiproceso is None:
+                multiproceso = ReconocimientoMultiproceso(frame.shape, PROCESOS_RECONOCIMIENTO,
+                                                          puerta=PUERTA)
+            
+            # Publicar el frame (sin dibujar) y usar el último resultado disponible
+            multiproceso.publicar(frame)
+            recibidos = multiproceso.resultados()
+            if recibidos:
+                _, _, faces, identidades = recibidos[-1]
+            else:
+                nuevo_resultado = False
+        elif planificador is not None:
+            resultado = planificador.procesar(frame, pool)
+            if resultado is None:
+                nuevo_resultado = False  # Frame saltado: se mantienen los últimos rostros
+            else:
+                faces, identidades = resultado
+        else:
+            # Convertir a escala de grises
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pool.get('gray', frame.shape[:2]))
+            
+            # Detectar rostros - PARÁMETROS MUY ESTRICTOS
+            faces = faceClassif.detectMultiScale(
+                gray, 
+                scaleFactor=1.4,      # CAMBIADO: Menos sensible (era 1.3)
+                minNeighbors=8,       # CAMBIADO: Más estricto (era 6)
+                minSize=(120, 120),   # CAMBIADO: Rostros más grandes (era 100)
+                maxSize=(250, 250)    # CAMBIADO: Rango más pequeño (era 300)
+            )
+            
+            # Reconocimiento facial de todos los rostros en un solo lote
+            identidades = reconocedor.identificar(reconocedor.recortes(frame, gray, faces, pool))
         
         current_result = "NO_DETECTADO"
         best_confidence = float('inf')
         detected_person = "Desconocido"
         
-        for (x, y, w, h) in faces:
-            # Extraer rostro
-            rostro = gray[y:y + h, x:x + w] 
-            rostro = cv2.resize(rostro, (150, 150), interpolation=cv2.INTER_CUBIC)
-            
-            # Reconocimiento facial
-            result = face_recognizer.predict(rostro)
-            confidence = result[1]
-            predicted_person = result[0]
+        for (x, y, w, h), identidad in zip(faces, identidades):
+            confidence = identidad['distance']
             
             # USAR UMBRAL DINÁMICO CALCULADO POR EL ENTRENADOR
-            if confidence < recommended_threshold and predicted_person < len(imagePaths):
+            if identidad['accepted']:
                 # ROSTRO AUTORIZADO
-                person_name = imagePaths[predicted_person]
+                person_name = identidad['name']
                 current_result = "DETECTADO"
                 detected_person = person_name
                 best_confidence = confidence
@@ -224,7 +262,7 @@ def main():
                            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 3)
                 cv2.putText(frame, f'Usuario: {person_name}', (x, y + h + 30), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.putText(frame, f'Confianza: {confidence:.0f}', (x, y + h + 55), 
+                cv2.putText(frame, f'Confianza: {confidence:.4g}', (x, y + h + 55), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
                 cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 4)
                 
@@ -234,22 +272,23 @@ def main():
                            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 255), 3)
                 cv2.putText(frame, 'ACCESO DENEGADO', (x, y + h + 30), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                cv2.putText(frame, f'Confianza: {confidence:.0f}', (x, y + h + 55), 
+                cv2.putText(frame, f'Confianza: {confidence:.4g}', (x, y + h + 55), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
                 cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 4)
         
-        # Sistema de estabilidad para evitar parpadeo
-        if current_result == last_result:
-            stable_count += 1
-        else:
-            stable_count = 0
-            last_result = current_result
+        # Sistema de estabilidad para evitar parpadeo (solo cuenta resultados nuevos)
+        if nuevo_resultado:
+            if current_result == last_result:
+                stable_count += 1
+            else:
+                stable_count = 0
+                last_result = current_result
         
         # Enviar al Arduino solo cuando el resultado sea estable
-        if stable_count == required_stability:
+        if nuevo_resultado and stable_count == required_stability:
             send_to_arduino(arduino_serial, current_result)
             if current_result == "DETECTADO":
-                print(f"✅ ACCESO AUTORIZADO - {detected_person} (Confianza: {best_confidence:.0f})")
+                print(f"✅ ACCESO AUTORIZADO - {detected_person} (Confianza: {best_confidence:.4g})")
             else:
                 print(f"❌ ACCESO DENEGADO - Sin rostros autorizados")
         
@@ -267,16 +306,30 @@ def main():
         cv2.putText(frame, f'ESP32-CAM: {working_url}', (10, 85), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         
+        if planificador is not None:
+            m = planificador.metricas()
+            cv2.putText(frame, f"Latencia: {m['latency_ms']:.0f}/{m['target_ms']:.0f} ms | "
+                       f"Nivel: {m['level']} | Saltados: {m['skipped_frames']}", (10, 110), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        
         # Mostrar video
         cv2.imshow('🎥 Sistema Integrado ESP32-CAM + Arduino TFT', frame)
         
         # Salir con 'q'
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
+        
+        pool.nuevo_frame()
+        if DEBUG_BUFFERS and pool.frames % 100 == 0:
+            print(f"🧮 Buffers: {pool.reporte()}")
+        if planificador is not None and planificador.frames % 100 == 0:
+            print(f"⏱️  Planificador: {planificador.metricas()}")
     
     # Limpiar recursos
     cap.release()
     cv2.destroyAllWindows()
+    if multiproceso is not None:
+        multiproceso.cerrar()
     if arduino_serial:
         arduino_serial.close()
     
@@ -0,0 +1,219 @@
+import cv2
+import os
+import csv
+import time
+import tempfile
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from AdvancedTrainer import obtenerModelo, dividir_holdout, bytes_por_imagen, procesos_por_memoria
+
+# Rejilla por defecto de configuraciones LBPH a comparar
+RADIOS = [1, 2, 3]
+VECINOS = [8, 12, 16]
+GRIDS = [4, 6, 8]
+
+# Conjunto de entrenamiento/prueba compartido por cada proceso
+_X_train = None
+_y_train = None
+_X_test = None
+_y_test = None
+
+def _iniciar_worker(X_train, y_train, X_test, y_test):
+    """Recibir las caras ya decodificadas y ecualizadas una sola vez por proceso"""
+    global _X_train, _y_train, _X_test, _y_test
+    _X_train, _y_train = X_train, y_train
+    _X_test, _y_test = X_test, y_test
+
+def evaluar_config(params):
+    """Entrenar una configuración y medir precisión, tamaño y tiempo de carga"""
+    t0 = time.perf_counter()
+    recognizer = cv2.face.LBPHFaceRecognizer_create(**params)
+    recognizer.train(list(_X_train), _y_train)
+    train_seconds = time.perf_counter() - t0
+
+    # Medir tamaño en disco y tiempo de carga desde el archivo
+    fd, model_path = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        recognizer.write(model_path)
+        model_bytes = os.path.getsize(model_path)
+        del recognizer
+
+        t0 = time.perf_counter()
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(model_path)
+        load_seconds = time.perf_counter() - t0
+    finally:
+        os.remove(model_path)
+
+    # Precisión con el modelo cargado; la latencia se mide aparte, sin otros procesos
+    correctas = 0
+    for face, label in zip(_X_test, _y_test):
+        predicted, _ = recognizer.predict(face)
+        correctas += predicted == label
+
+    return {
+        **params,
+        'accuracy': 100.0 * correctas / len(_X_test),
+        'model_mb': model_bytes / 1e6,
+        'load_seconds': load_seconds,
+        'train_seconds': train_seconds,
+    }
+
+def medir_latencia(params):
+    """Latencia de predicción por rostro de una configuración"""
+    recognizer = cv2.face.LBPHFaceRecognizer_create(**params)
+    recognizer.train(list(_X_train), _y_train)
+    t0 = time.perf_counter()
+    for face in _X_test:
+        recognizer.predict(face)
+    return (time.perf_counter() - t0) * 1000 / len(_X_test)
+
+def frente_pareto(resultados):
+    """Configuraciones no dominadas en (precisión máxima, latencia mínima)"""
+    acc = np.array([r['accuracy'] for r in resultados])
+    lat = np.array([r['predict_ms'] for r in resultados])
+
+    # r domina a i si no es peor en nada y es mejor en algo
+    no_peor = (acc[:, None] >= acc[None, :]) & (lat[:, None] <= lat[None, :])
+    mejor = (acc[:, None] > acc[None, :]) | (lat[:, None] < lat[None, :])
+    dominada = (no_peor & mejor).any(axis=0)
+
+    frente = [r for r, d in zip(resultados, dominada) if not d]
+    return sorted(frente, key=lambda r: r['predict_ms'])
+
+def _evaluar_grupo(configs, workers, resultados, X_train, y_train, X_test, y_test):
+    """Evaluar configuraciones en un pool; devuelve las que no terminaron"""
+    fallidas = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                             initargs=(X_train, y_train, X_test, y_test)) as pool:
+        futuros = {pool.submit(evaluar_config, params): params for params in configs}
+        for futuro in as_completed(futuros):
+            try:
+                r = futuro.result()
+            except BrokenProcessPool:
+                fallidas.append(futuros[futuro])
+                continue
+            resultados.append(r)
+            print(f"  r={r['radius']} n={r['neighbors']} grid={r['grid_x']}: "
+                  f"{r['accuracy']:.1f}% | {r['model_mb']:.1f} MB | carga {r['load_seconds']:.2f}s")
+    return fallidas
+
+def _latencias_en_serie(resultados, X_train, y_train, X_test, y_test):
+    """Medir la latencia de cada configuración de una en una, en las mismas condiciones"""
+    # En paralelo cada configuración competiría por los núcleos con un número distinto
+    # de procesos según su grupo de memoria, y las latencias no serían comparables
+    medidos = []
+    for r in resultados:
+        params = {clave: r[clave] for clave in ('radius', 'neighbors', 'grid_x', 'grid_y')}
+        try:
+            with ProcessPoolExecutor(max_workers=1, initializer=_iniciar_worker,
+                                     initargs=(X_train, y_train, X_test, y_test)) as pool:
+                r['predict_ms'] = pool.submit(medir_latencia, params).result()
+        except BrokenProcessPool:
+            print(f"❌ r={r['radius']} n={r['neighbors']} grid={r['grid_x']}: "
+                  f"el proceso terminó abruptamente al medir la latencia")
+            continue
+        medidos.append(r)
+        print(f"  r={r['radius']} n={r['neighbors']} grid={r['grid_x']}: "
+              f"{r['predict_ms']:.2f} ms/rostro")
+    return medidos
+
+def barrer_configuraciones(radios=RADIOS, vecinos=VECINOS, grids=GRIDS, max_workers=None):
+    """Precisión, tamaño y carga de toda la rejilla en paralelo; latencia en serie"""
+    faces, labels, _ = obtenerModelo()
+    if len(faces) == 0:
+        print("❌ Error: No se encontraron imágenes válidas para entrenar")
+        return []
+
+    X_train, X_test, y_train, y_test = dividir_holdout(faces, labels)
+    X_train = np.asarray(X_train, dtype=np.uint8)
+    X_test = np.asarray(X_test, dtype=np.uint8)
+    y_train = np.asarray(y_train, dtype=np.int32)
+    y_test = np.asarray(y_test, dtype=np.int32)
+
+    configs = [
+        dict(radius=r, neighbors=n, grid_x=g, grid_y=g)
+        for r, n, g in itertools.product(radios, vecinos, grids)
+    ]
+    print(f"🔬 Evaluando {len(configs)} configuraciones LBPH "
+          f"({len(X_train)} entrenamiento / {len(X_test)} prueba)")
+
+    # Cada proceso guarda el modelo entero y su copia recargada: agrupar las
+    # configuraciones por cuántos procesos caben en RAM a la vez
+    cores = os.cpu_count() or 1
+    grupos = {}
+    for params in configs:
+        por_proceso = 2 * bytes_por_imagen('lbph', params) * len(X_train) + X_train.nbytes
+        workers = max_workers or procesos_por_memoria(por_proceso, cores)
+        grupos.setdefault(workers, []).append(params)
+
+    resultados = []
+    fallidas = []
+    for workers, grupo in sorted(grupos.items(), reverse=True):
+        fallidas += _evaluar_grupo(grupo, workers, resultados, X_train, y_train, X_test, y_test)
+
+    # Un proceso que se queda sin memoria rompe todo su pool: repetir de una en una
+    if fallidas:
+        print(f"⚠️  Repitiendo {len(fallidas)} configuración(es) de una en una")
+    for params in fallidas:
+        if _evaluar_grupo([params], 1, resultados, X_train, y_train, X_test, y_test):
+            print(f"❌ r={params['radius']} n={params['neighbors']} grid={params['grid_x']}: "
+                  f"el proceso terminó abruptamente (¿memoria insuficiente?)")
+
+    print("\n⏱️  Midiendo la latencia de cada configuración en serie...")
+    return _latencias_en_serie(resultados, X_train, y_train, X_test, y_test)
+
+def guardar_csv(resultados, path):
+    """Guardar todos los resultados del barrido"""
+    campos = ['radius', 'neighbors', 'grid_x', 'grid_y', 'accuracy', 'model_mb',
+              'load_seconds', 'predict_ms', 'train_seconds']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=campos)
+        writer.writeheader()
+        writer.writerows(resultados)
+
+def main():
+    parser = argparse.ArgumentParser(description='Barrido de hiperparámetros LBPH')
+    parser.add_argument('--radios', type=int, nargs='+', default=RADIOS)
+    parser.add_argument('--vecinos', type=int, nargs='+', default=VECINOS)
+    parser.add_argument('--grids', type=int, nargs='+', default=GRIDS)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Procesos en paralelo (por defecto, los que caben en RAM)')
+    parser.add_argument('--precision-minima', type=float, default=None,
+                        help='Elegir la configuración más rápida con al menos esta precisión (%%)')
+    parser.add_argument('--salida', default='lbph_sweep.csv')
+    args = parser.parse_args()
+
+    print('🚀 BARRIDO DE HIPERPARÁMETROS LBPH')
+    print('='*60)
+
+    resultados = barrer_configuraciones(args.radios, args.vecinos, args.grids, args.workers)
+    if not resultados:
+        return
+
+    guardar_csv(resultados, args.salida)
+
+    print(f"\n🏆 Frente de Pareto (precisión vs. latencia):")
+    frente = frente_pareto(resultados)
+    for r in frente:
+        print(f"   • radius={r['radius']} neighbors={r['neighbors']} grid={r['grid_x']}x{r['grid_y']}: "
+              f"{r['accuracy']:.1f}% | {r['predict_ms']:.2f} ms/rostro | {r['model_mb']:.1f} MB")
+
+    if args.precision_minima is not None:
+        candidatas = [r for r in frente if r['accuracy'] >= args.precision_minima]
+        if candidatas:
+            r = candidatas[0]
+            print(f"\n✅ Más rápida con precisión >= {args.precision_minima:.1f}%: "
+                  f"radius={r['radius']} neighbors={r['neighbors']} grid={r['grid_x']}x{r['grid_y']}")
+        else:
+            print(f"\n❌ Ninguna configuración alcanza {args.precision_minima:.1f}% de precisión")
+
+    print(f"\n📄 Resultados guardados en: {args.salida}")
+
+if __name__ == "__main__":
+    main()
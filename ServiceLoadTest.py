@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+async def _peticion(reader, writer, host, ruta, jpeg):
+    """Enviar un POST con keep-alive y leer la respuesta JSON"""
+    writer.write((f"POST {ruta} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n").encode() + jpeg)
+    await writer.drain()
+
+    await reader.readline()
+    largo = 0
+    while True:
+        linea = await reader.readline()
+        if linea in (b'\r\n', b''):
+            break
+        clave, valor = linea.decode('latin-1').split(':', 1)
+        if clave.strip().lower() == 'content-length':
+            largo = int(valor)
+    return json.loads(await reader.readexactly(largo))
+
+async def _cliente(host, port, ruta, imagenes, n, latencias):
+    """Un cliente (una puerta) enviando n peticiones seguidas"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(n):
+            t0 = time.perf_counter()
+            await _peticion(reader, writer, host, ruta, imagenes[i % len(imagenes)])
+            latencias.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+async def medir(host, port, ruta, imagenes, concurrencia, peticiones):
+    """Throughput y latencias con varios clientes concurrentes"""
+    latencias = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*[
+        _cliente(host, port, ruta, imagenes, peticiones, latencias) for _ in range(concurrencia)
+    ])
+    total = time.perf_counter() - t0
+    lat = np.array(latencias) * 1000
+    return len(lat) / total, np.percentile(lat, 50), np.percentile(lat, 95)
+
+def cargar_imagenes(carpeta, limite=50):
+    """Bytes JPEG de ejemplo para las peticiones"""
+    archivos = sorted(f for f in os.listdir(carpeta) if f.lower().endswith(('.jpg', '.jpeg')))
+    imagenes = []
+    for archivo in archivos[:limite]:
+        with open(os.path.join(carpeta, archivo), 'rb') as f:
+            imagenes.append(f.read())
+    return imagenes
+
+async def _main(args):
+    imagenes = cargar_imagenes(args.carpeta)
+    if not imagenes:
+        print(f"❌ No hay imágenes JPEG en {args.carpeta}")
+        return
+
+    ruta = '/identify?crop=1' if args.recortes else '/identify'
+    print(f"📡 {args.host}:{args.port}{ruta} con {len(imagenes)} imágenes de {args.carpeta}")
+    print(f"{'clientes':>9}{'pet/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for concurrencia in args.concurrencia:
+        rps, p50, p95 = await medir(args.host, args.port, ruta, imagenes,
+                                    concurrencia, args.peticiones)
+        print(f"{concurrencia:>9}{rps:>10.1f}{p50:>10.1f}{p95:>10.1f}")
+
+    # Tamaños de lote que vio el servidor durante la prueba
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    writer.write(f"GET /stats HTTP/1.1\r\nHost: {args.host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    respuesta = await reader.read()
+    writer.close()
+    stats = json.loads(respuesta.split(b'\r\n\r\n', 1)[1])
+    print(f"\n📊 Lote medio en el servidor: {stats['mean_batch_size']} | lotes: {stats['batch_sizes']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del servicio de verificación')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--carpeta', default=os.path.join('Data', 'nicol'))
+    parser.add_argument('--recortes', action='store_true',
+                        help='Las imágenes ya son recortes de rostro (omite la detección)')
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--peticiones', type=int, default=50,
+                        help='Peticiones por cliente en cada nivel de concurrencia')
+    asyncio.run(_main(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import cv2
+import os
+import time
+import zlib
+import argparse
+import numpy as np
+import multiprocessing as mp
+from queue import Empty
+from multiprocessing import shared_memory
+
+from BufferPool import BufferPool
+from FacePipeline import Reconocedor, detectar_rostros
+
+# Metadatos de cada slot; seq impar = el productor está escribiendo
+_META_DTYPE = np.dtype([('seq', np.int64), ('frame_id', np.int64), ('timestamp', np.float64),
+                        ('checksum', np.int64)])
+
+class SharedFrameRing:
+    """Ring buffer de frames en memoria compartida con metadatos por slot"""
+
+    def __init__(self, shape, slots=8, nombre=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        offset_meta = 8
+        offset_frames = offset_meta + _META_DTYPE.itemsize * slots
+        tam = offset_frames + int(np.prod(self.shape)) * slots
+
+        self.propietario = nombre is None
+        if self.propietario:
+            self.shm = shared_memory.SharedMemory(create=True, size=tam)
+        else:
+            # Los lectores son procesos hijos: comparten el resource_tracker del creador,
+            # que es el único que llama a unlink()
+            self.shm = shared_memory.SharedMemory(name=nombre)
+
+        self._ultimo = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        self.meta = np.ndarray((slots,), dtype=_META_DTYPE, buffer=self.shm.buf, offset=offset_meta)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf,
+                                 offset=offset_frames)
+        if self.propietario:
+            self._ultimo[0] = -1
+            self.meta['seq'] = 0
+            self.meta['frame_id'] = -1
+
+    @property
+    def nombre(self):
+        return self.shm.name
+
+    def publicar(self, frame, frame_id, timestamp):
+        """Copiar un frame a su slot y marcarlo como listo"""
+        slot = frame_id % self.slots
+        checksum = zlib.adler32(np.ascontiguousarray(frame))
+        self.meta['seq'][slot] += 1
+        np.copyto(self.frames[slot], frame)
+        self.meta['frame_id'][slot] = frame_id
+        self.meta['timestamp'][slot] = timestamp
+        self.meta['checksum'][slot] = checksum
+        self.meta['seq'][slot] += 1
+        self._ultimo[0] = frame_id
+
+    def ultimo_id(self):
+        return int(self._ultimo[0])
+
+    def leer(self, frame_id):
+        """Vista sin copiar del frame y su marca para validar(); None si no está o se está escribiendo"""
+        slot = frame_id % self.slots
+        seq = int(self.meta['seq'][slot])
+        if seq % 2 or self.meta['frame_id'][slot] != frame_id:
+            return None
+        marca = (slot, seq, float(self.meta['timestamp'][slot]), int(self.meta['checksum'][slot]))
+        return self.frames[slot], marca
+
+    def validar(self, marca):
+        """Timestamp del frame si su slot no cambió mientras se usaba la vista; None si se sobrescribió"""
+        slot, seq, timestamp, checksum = marca
+        # Los stores de numpy no llevan barreras de memoria: en x86 (TSO) basta con
+        # que seq no cambie, pero en ARM otro núcleo puede ver los píxeles nuevos antes
+        # que el seq impar. El checksum del slot descarta los frames a medio escribir
+        if int(self.meta['seq'][slot]) != seq or zlib.adler32(self.frames[slot]) != checksum:
+            return None
+        return timestamp
+
+    def cerrar(self):
+        # Soltar las vistas antes de cerrar el mapeo
+        self._ultimo = self.meta = self.frames = None
+        self.shm.close()
+        if self.propietario:
+            self.shm.unlink()
+
+def proceso_reconocimiento(nombre, shape, slots, indice, total, resultados, parar, puerta=None):
+    """Reconocer los frames indice, indice+total, ... directamente sobre la memoria compartida"""
+    ring = SharedFrameRing(shape, slots, nombre)
+    reconocedor = Reconocedor(puerta=puerta)
+    pool = BufferPool()
+    siguiente = indice
+
+    while not parar.is_set():
+        ultimo = ring.ultimo_id()
+        if ultimo < siguiente:
+            time.sleep(0.001)
+            continue
+
+        # El frame más reciente de esta franja; los anteriores ya están viejos
+        frame_id = ultimo - ((ultimo - indice) % total)
+        siguiente = frame_id + total
+        lectura = ring.leer(frame_id)
+        if lectura is None:
+            continue
+        frame, marca = lectura
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pool.get('gray', frame.shape[:2]))
+
+        faces = detectar_rostros(reconocedor.detector, gray)
+        identidades = reconocedor.identificar(reconocedor.recortes(frame, gray, faces, pool))
+        # Validar al terminar: si el productor reescribió el slot, el resultado no vale
+        timestamp = ring.validar(marca)
+        if timestamp is None:
+            continue
+        resultados.put((frame_id, timestamp, faces, identidades))
+
+    ring.cerrar()
+
+class ReconocimientoMultiproceso:
+    """Captura en este proceso; detección y reconocimiento en procesos aparte"""
+
+    def __init__(self, shape, procesos=2, slots=8, puerta=None):
+        self.ring = SharedFrameRing(shape, slots)
+        self.resultados_cola = mp.Queue()
+        self.parar = mp.Event()
+        self.frame_id = 0
+        self.ultimo_resultado = -1
+        self.procesos = [
+            mp.Process(target=proceso_reconocimiento, daemon=True,
+                       args=(self.ring.nombre, shape, slots, i, procesos,
+                             self.resultados_cola, self.parar, puerta))
+            for i in range(procesos)
+        ]
+        for p in self.procesos:
+            p.start()
+
+    def publicar(self, frame):
+        self.ring.publicar(frame, self.frame_id, time.monotonic())
+        self.frame_id += 1
+
+    def resultados(self):
+        """Resultados nuevos, sin bloquear, descartando los que llegan desordenados"""
+        nuevos = []
+        while True:
+            try:
+                resultado = self.resultados_cola.get_nowait()
+            except Empty:
+                break
+            if resultado[0] > self.ultimo_resultado:
+                self.ultimo_resultado = resultado[0]
+                nuevos.append(resultado)
+        return nuevos
+
+    def cerrar(self):
+        self.parar.set()
+        for p in self.procesos:
+            p.join(timeout=2)
+        self.ring.cerrar()
+
+def _frames_de_prueba(video, n=120, shape=(480, 640, 3)):
+    """Frames de un video o frames sintéticos con rostros de Data/"""
+    if video:
+        cap = cv2.VideoCapture(video)
+        frames = []
+        while len(frames) < n:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        return frames
+
+    rostros = []
+    for persona in os.listdir('Data'):
+        carpeta = os.path.join('Data', persona)
+        if os.path.isdir(carpeta):
+            rostros += [os.path.join(carpeta, f) for f in sorted(os.listdir(carpeta))[:n]]
+    frames = []
+    for i in range(n):
+        frame = np.full(shape, 90, dtype=np.uint8)
+        rostro = cv2.imread(rostros[i % len(rostros)])
+        rostro = cv2.resize(rostro, (200, 200))
+        frame[140:340, 220:420] = rostro
+        frames.append(frame)
+    return frames
+
+def benchmark(video=None, procesos=2, segundos=10.0, fps=0):
+    """Frames/s y latencia: un solo proceso contra el ring en memoria compartida"""
+    frames = _frames_de_prueba(video)
+    intervalo = 1.0 / fps if fps > 0 else 0.0
+
+    # Bucle de un solo proceso como en IntegratedSystem
+    reconocedor = Reconocedor()
+    pool = BufferPool()
+    latencias = []
+    t0 = time.monotonic()
+    n = 0
+    while time.monotonic() - t0 < segundos:
+        inicio = time.monotonic()
+        frame = frames[n % len(frames)]
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=pool.get('gray', frame.shape[:2]))
+        faces = detectar_rostros(reconocedor.detector, gray)
+        reconocedor.identificar(reconocedor.recortes(frame, gray, faces, pool))
+        latencias.append(time.monotonic() - inicio)
+        n += 1
+        espera = intervalo - (time.monotonic() - inicio)
+        if espera > 0:
+            time.sleep(espera)
+    fps_uno = n / (time.monotonic() - t0)
+    lat_uno = np.array(latencias) * 1000
+
+    # Captura + procesos de reconocimiento con memoria compartida
+    multi = ReconocimientoMultiproceso(frames[0].shape, procesos)
+    time.sleep(2.0)  # que los procesos terminen de cargar el modelo
+    latencias = []
+    procesados = 0
+    publicados = 0
+    t0 = time.monotonic()
+    proximo = t0
+    while time.monotonic() - t0 < segundos:
+        if time.monotonic() >= proximo:
+            multi.publicar(frames[publicados % len(frames)])
+            publicados += 1
+            proximo += intervalo
+        # Revisar resultados entre frames para no sumar la espera a la latencia
+        for _, timestamp, _, _ in multi.resultados():
+            latencias.append(time.monotonic() - timestamp)
+            procesados += 1
+        time.sleep(0.0005)
+    total = time.monotonic() - t0
+    multi.cerrar()
+    fps_multi = procesados / total
+    lat_multi = np.array(latencias) * 1000 if latencias else np.zeros(1)
+
+    print(f"\n📊 {len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"{'máxima velocidad' if fps <= 0 else f'cámara a {fps} fps'}, {segundos:.0f}s por modo")
+    print(f"{'Modo':<28}{'frames/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'Un proceso':<28}{fps_uno:>10.1f}{np.percentile(lat_uno, 50):>10.1f}"
+          f"{np.percentile(lat_uno, 95):>10.1f}")
+    print(f"{f'Memoria compartida x{procesos}':<28}{fps_multi:>10.1f}"
+          f"{np.percentile(lat_multi, 50):>10.1f}{np.percentile(lat_multi, 95):>10.1f}")
+    print(f"   (publicados {publicados / total:.1f} frames/s; los no procesados se descartan)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark del transporte de frames en memoria compartida')
+    parser.add_argument('--video', default=None, help='Video de prueba (por defecto, frames sintéticos)')
+    parser.add_argument('--procesos', type=int, default=2)
+    parser.add_argument('--segundos', type=float, default=10.0)
+    parser.add_argument('--fps', type=float, default=0, help='Ritmo de la cámara simulada (0 = máximo)')
+    args = parser.parse_args()
+    benchmark(args.video, args.procesos, args.segundos, args.fps)
@@ -1,14 +1,18 @@
 import cv2
 import os
+import argparse
 import numpy as np
 
-def obtenerModelo():
+from FaceModels import MODEL_PATHS, cargar_config, guardar_config, crear_reconocedor, guardar_nombres
+
+def obtenerModelo(color=False):
     dataPath = 'Data'  # Ruta relativa corregida
     peopleList = os.listdir(dataPath)
     print('Lista de personas: ', peopleList)
     
     labels = []
     facesData = []
+    nombres = []  # nombres[label]: se guardan con el modelo
     label = 0
     
     for nameDir in peopleList:
@@ -30,20 +34,25 @@ def obtenerModelo():
                 print('Rostro: ', nameDir + '/' + fileName)
                 labels.append(label)
                 img_path = os.path.join(personPath, fileName)
-                img = cv2.imread(img_path, 0)
+                img = cv2.imread(img_path, cv2.IMREAD_COLOR if color else cv2.IMREAD_GRAYSCALE)
                 if img is not None:
                     facesData.append(img)
                 else:
                     print(f"No se pudo cargar: {img_path}")
         
+        nombres.append(nameDir)
         label += 1
     
-    return facesData, labels
+    return facesData, labels, nombres
+
+parser = argparse.ArgumentParser(description='Entrenar el modelo de reconocimiento facial')
+parser.add_argument('--reconocedor', choices=sorted(MODEL_PATHS), default='lbph')
+args = parser.parse_args()
 
 print('Entrenando modelo...')
 
 try:
-    faces, labels = obtenerModelo()
+    faces, labels, nombres = obtenerModelo(color=args.reconocedor == 'embedding')
     
     # Verificar que tenemos datos
     if len(faces) == 0:
@@ -54,12 +63,22 @@ try:
     print(f"Entrenando con {len(faces)} imágenes...")
     
     # Crear y entrenar el reconocedor
-    face_recognizer = cv2.face.LBPHFaceRecognizer_create()
+    face_recognizer = crear_reconocedor(args.reconocedor)
     face_recognizer.train(faces, np.array(labels))
+    guardar_nombres(face_recognizer, nombres)
     
-    # Guardar el modelo
-    model_path = 'FacesModel.xml'
+    # Guardar el modelo y anotar en la configuración cuál usar
+    model_path = MODEL_PATHS[args.reconocedor]
     face_recognizer.write(model_path)
+    config = cargar_config()
+    if config.get('recognizer', 'lbph') != args.reconocedor:
+        # El umbral anterior está en la escala de otro reconocedor
+        config.pop('recommended_threshold', None)
+        if args.reconocedor != 'lbph':
+            print("⚠️ Sin umbral para este reconocedor se rechazarán todos los rostros: "
+                  f"ejecuta AdvancedTrainer.py --reconocedor {args.reconocedor} para calibrarlo")
+    config.update({'recognizer': args.reconocedor, 'model_path': model_path})
+    guardar_config(config)
     print(f'Modelo guardado como {model_path}')
     print('Entrenamiento completado!')
     
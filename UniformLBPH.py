@@ -0,0 +1,277 @@
+import cv2
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from BufferPool import rss_pico_mb
+from FaceGallery import rangos_por_etiqueta, predecir_en_tramos, guardar_label_info, leer_label_info
+
+def tabla_uniforme(neighbors, rotation_invariant=False):
+    """Tabla código LBP -> bin para patrones uniformes (como mucho 2 transiciones)"""
+    codes = np.arange(1 << neighbors, dtype=np.int64)
+    rotado = ((codes << 1) | (codes >> (neighbors - 1))) & ((1 << neighbors) - 1)
+    transiciones = np.array([bin(c).count('1') for c in (codes ^ rotado)])
+    uniforme = transiciones <= 2
+
+    if rotation_invariant:
+        # riu2: un bin por número de unos + uno para los no uniformes
+        unos = np.array([bin(c).count('1') for c in codes])
+        tabla = np.where(uniforme, unos, neighbors + 1)
+        n_bins = neighbors + 2
+    else:
+        # u2: un bin por patrón uniforme + uno para todos los no uniformes
+        n_uniformes = int(uniforme.sum())
+        tabla = np.full(len(codes), n_uniformes, dtype=np.int64)
+        tabla[uniforme] = np.arange(n_uniformes)
+        n_bins = n_uniformes + 1
+
+    return tabla.astype(np.int32), n_bins
+
+def codigos_lbp(img, radius, neighbors):
+    """LBP extendido (circular, interpolado) igual que cv2.face.LBPHFaceRecognizer"""
+    src = img.astype(np.float32)
+    rows, cols = src.shape
+    centro = src[radius:rows - radius, radius:cols - radius]
+    codes = np.zeros(centro.shape, dtype=np.int64)
+
+    for n in range(neighbors):
+        x = np.float32(radius * np.cos(2.0 * np.pi * n / neighbors))
+        y = np.float32(-radius * np.sin(2.0 * np.pi * n / neighbors))
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        tx, ty = x - fx, y - fy
+        w1 = (1 - tx) * (1 - ty)
+        w2 = tx * (1 - ty)
+        w3 = (1 - tx) * ty
+        w4 = tx * ty
+
+        def vecino(dy, dx):
+            return src[radius + dy:rows - radius + dy, radius + dx:cols - radius + dx]
+
+        t = w1 * vecino(fy, fx) + w2 * vecino(fy, cx) + w3 * vecino(cy, fx) + w4 * vecino(cy, cx)
+        activo = (t > centro) | (np.abs(t - centro) < np.finfo(np.float32).eps)
+        codes |= activo.astype(np.int64) << n
+
+    return codes
+
+def _bins_espaciales(codes, n_bins, grid_x, grid_y):
+    """Bin del histograma espacial de cada píxel y número de píxeles por celda"""
+    rows, cols = codes.shape
+    height, width = rows // grid_y, cols // grid_x
+    celdas = codes[:grid_y * height, :grid_x * width]
+
+    # Índice de celda de cada píxel para contar todas las celdas a la vez
+    celda_y = np.repeat(np.arange(grid_y), height)[:, None]
+    celda_x = np.repeat(np.arange(grid_x), width)[None, :]
+    return ((celda_y * grid_x + celda_x) * n_bins + celdas).ravel(), height * width
+
+def histograma_espacial(codes, n_bins, grid_x, grid_y):
+    """Histogramas normalizados por celda, concatenados en un vector float32"""
+    indice, pixeles = _bins_espaciales(codes, n_bins, grid_x, grid_y)
+    hist = np.bincount(indice, minlength=grid_x * grid_y * n_bins)
+    return (hist / float(pixeles)).astype(np.float32)
+
+def histograma_espacial_disperso(codes, n_bins, grid_x, grid_y):
+    """El mismo histograma como (bins activos, valores float32), sin el vector denso"""
+    indice, pixeles = _bins_espaciales(codes, n_bins, grid_x, grid_y)
+    activos, cuentas = np.unique(indice, return_counts=True)
+    return activos, (cuentas / float(pixeles)).astype(np.float32)
+
+def distancia_chi2(galeria, sumas, query):
+    """Chi-cuadrado (HISTCMP_CHISQR_ALT) de un histograma contra cada fila de la galería"""
+    # (g-q)²/(g+q) = g + q - 4gq/(g+q): el último término solo existe donde q > 0
+    activos = np.flatnonzero(query)
+    q = query[activos]
+    g = galeria[:, activos]
+    cruzado = (g * q / (g + q)).sum(axis=1)
+    return 2.0 * (sumas + q.sum() - 4.0 * cruzado)
+
+class UniformLBPHRecognizer:
+    """Variante de LBPH con patrones uniformes; misma interfaz que cv2.face"""
+
+    def __init__(self, radius=2, neighbors=16, grid_x=8, grid_y=8,
+                 rotation_invariant=False, threshold=np.inf):
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.rotation_invariant = rotation_invariant
+        self.threshold = threshold
+        self._tabla, self._n_bins = tabla_uniforme(neighbors, rotation_invariant)
+        self._histograms = np.empty((0, grid_x * grid_y * self._n_bins), dtype=np.float32)
+        self._labels = np.empty(0, dtype=np.int32)
+        self._sumas = np.empty(0, dtype=np.float32)
+        self._rangos = {}
+        self._label_info = {}
+
+    def extraer(self, face):
+        """Vector de características de un rostro"""
+        codes = self._tabla[codigos_lbp(face, self.radius, self.neighbors)]
+        return histograma_espacial(codes, self._n_bins, self.grid_x, self.grid_y)
+
+    def _indexar(self):
+        """Galería ordenada por etiqueta: cada persona ocupa un tramo contiguo de filas"""
+        orden = np.argsort(self._labels, kind='stable')
+        self._histograms = self._histograms[orden]
+        self._labels = self._labels[orden]
+        self._sumas = self._histograms.sum(axis=1)
+        self._rangos = rangos_por_etiqueta(self._labels)
+
+    def train(self, faces, labels):
+        self._histograms = np.stack([self.extraer(f) for f in faces])
+        self._labels = np.asarray(labels, dtype=np.int32).ravel()
+        self._indexar()
+
+    def distancias(self, face):
+        """Chi-cuadrado contra toda la galería a la vez"""
+        return distancia_chi2(self._histograms, self._sumas, self.extraer(face))
+
+    def predict(self, face):
+        dist = self.distancias(face)
+        i = int(np.argmin(dist))
+        if dist[i] >= self.threshold:
+            return -1, float(np.finfo(np.float64).max)
+        return int(self._labels[i]), float(dist[i])
+
+    def _distancias_tramo(self, consultas, inicio, fin):
+        g, sumas = self._histograms[inicio:fin], self._sumas[inicio:fin]
+        return np.stack([distancia_chi2(g, sumas, q) for q in consultas])
+
+    def predict_batch(self, faces, permitidos=None):
+        """Etiquetas y distancias de un lote, comparando solo con las etiquetas permitidas"""
+        return predecir_en_tramos(faces, lambda fs: [self.extraer(f) for f in fs],
+                                  self._distancias_tramo, self._rangos, self._labels,
+                                  self.threshold, permitidos)
+
+    def getHistograms(self):
+        return self._histograms
+
+    def getLabels(self):
+        return self._labels
+
+    def getThreshold(self):
+        return self.threshold
+
+    def setThreshold(self, threshold):
+        self.threshold = threshold
+
+    def getLabelInfo(self, label):
+        return self._label_info.get(int(label), '')
+
+    def setLabelInfo(self, label, info):
+        self._label_info[int(label)] = info
+
+    def write(self, path):
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                params=np.array([self.radius, self.neighbors, self.grid_x, self.grid_y,
+                                 int(self.rotation_invariant)]),
+                threshold=np.float64(self.threshold),
+                histograms=self._histograms,
+                labels=self._labels,
+                **guardar_label_info(self._label_info),
+            )
+
+    def read(self, path):
+        with np.load(path) as data:
+            radius, neighbors, grid_x, grid_y, rotation_invariant = data['params'].tolist()
+            self.__init__(radius, neighbors, grid_x, grid_y, bool(rotation_invariant),
+                          float(data['threshold']))
+            self._histograms = data['histograms']
+            self._labels = data['labels']
+            self._label_info = leer_label_info(data)
+        self._indexar()
+
+def medir_variante(nombre, crear, X_train, y_train, X_test, y_test):
+    """Entrenar, guardar y predecir una variante en un proceso limpio"""
+    rss_inicial = rss_pico_mb()
+    recognizer = crear()
+
+    t0 = time.perf_counter()
+    recognizer.train(list(X_train), np.asarray(y_train, dtype=np.int32))
+    train_seconds = time.perf_counter() - t0
+
+    histograms = recognizer.getHistograms()
+    floats_por_imagen = int(np.asarray(histograms[0]).size)
+    galeria_mb = sum(np.asarray(h).nbytes for h in histograms) / 1e6
+
+    fd, model_path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        recognizer.write(model_path)
+        model_mb = os.path.getsize(model_path) / 1e6
+    finally:
+        os.remove(model_path)
+
+    correctas = 0
+    t0 = time.perf_counter()
+    for face, label in zip(X_test, y_test):
+        correctas += recognizer.predict(face)[0] == label
+    predict_ms = (time.perf_counter() - t0) * 1000 / len(X_test)
+
+    return {
+        'nombre': nombre,
+        'floats_por_imagen': floats_por_imagen,
+        'galeria_mb': galeria_mb,
+        'model_mb': model_mb,
+        'rss_mb': None if rss_inicial is None else rss_pico_mb() - rss_inicial,
+        'train_seconds': train_seconds,
+        'predict_ms': predict_ms,
+        'accuracy': 100.0 * correctas / len(X_test),
+    }
+
+def _lbph_opencv(radius, neighbors, grid):
+    return cv2.face.LBPHFaceRecognizer_create(radius=radius, neighbors=neighbors,
+                                              grid_x=grid, grid_y=grid)
+
+def _lbph_uniforme(radius, neighbors, grid, rotation_invariant):
+    return UniformLBPHRecognizer(radius, neighbors, grid, grid, rotation_invariant)
+
+def benchmark(radius=2, neighbors=16, grid=8):
+    """Comparar memoria, tamaño de modelo y latencia contra el LBPH actual"""
+    from functools import partial
+    from AdvancedTrainer import obtenerModelo, dividir_holdout
+
+    faces, labels, _ = obtenerModelo()
+    X_train, X_test, y_train, y_test = dividir_holdout(faces, labels)
+
+    variantes = [
+        ('LBPH OpenCV', partial(_lbph_opencv, radius, neighbors, grid)),
+        ('LBP uniforme', partial(_lbph_uniforme, radius, neighbors, grid, False)),
+        ('LBP uniforme rot. inv.', partial(_lbph_uniforme, radius, neighbors, grid, True)),
+    ]
+
+    # Un proceso nuevo por variante para que el RSS pico no se mezcle
+    resultados = []
+    for nombre, crear in variantes:
+        try:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                resultados.append(pool.submit(medir_variante, nombre, crear,
+                                              X_train, y_train, X_test, y_test).result())
+        except BrokenProcessPool:
+            # Con neighbors=16 el LBPH de OpenCV puede agotar la RAM
+            print(f"❌ {nombre}: el proceso terminó abruptamente (¿memoria insuficiente?)")
+
+    print(f"\n📊 radius={radius} neighbors={neighbors} grid={grid}x{grid} "
+          f"({len(X_train)} entrenamiento / {len(X_test)} prueba)")
+    print(f"{'Variante':<24}{'floats/img':>12}{'galería MB':>12}{'modelo MB':>11}"
+          f"{'RSS MB':>9}{'ms/rostro':>11}{'precisión':>11}")
+    for r in resultados:
+        rss = 'n/d' if r['rss_mb'] is None else f"{r['rss_mb']:.0f}"
+        print(f"{r['nombre']:<24}{r['floats_por_imagen']:>12}{r['galeria_mb']:>12.1f}"
+              f"{r['model_mb']:>11.1f}{rss:>9}{r['predict_ms']:>11.2f}"
+              f"{r['accuracy']:>10.1f}%")
+    return resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark LBP uniforme vs. LBPH de OpenCV')
+    parser.add_argument('--radius', type=int, default=2)
+    parser.add_argument('--vecinos', type=int, default=16)
+    parser.add_argument('--grid', type=int, default=8)
+    args = parser.parse_args()
+    benchmark(args.radius, args.vecinos, args.grid)
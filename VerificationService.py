@@ -0,0 +1,284 @@
+import cv2
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from collections import Counter, deque
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from FaceModels import PUERTAS_PATH, cargar_puertas
+from FacePipeline import detectar_rostros, iniciar_worker, reconocedor_worker
+
+MAX_CUERPO_MB = 10  # Un frame JPEG de la ESP32-CAM ocupa unos cientos de KB
+
+def _listo():
+    """Tarea vacía para arrancar un proceso del pool"""
+    return True
+
+def procesar_lote(items):
+    """Detectar y reconocer un lote de imágenes JPEG con una sola predicción"""
+    t0 = time.perf_counter()
+    reconocedor = reconocedor_worker()
+    rostros = []
+    puertas = []
+    cajas = []
+    for jpeg, es_recorte, puerta in items:
+        # En color: los embeddings usan el recorte BGR; LBPH, el gris
+        img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            cajas.append(None)
+            continue
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if es_recorte:
+            faces = np.array([[0, 0, gray.shape[1], gray.shape[0]]], dtype=np.int32)
+        else:
+            faces = detectar_rostros(reconocedor.detector, gray)
+        rostros.extend(reconocedor.recortes(img, gray, faces))
+        cajas.append(faces)
+        puertas += [puerta] * len(faces)
+
+    # Una sola llamada al reconocedor por puerta presente en el lote
+    identidades = [None] * len(rostros)
+    for puerta in set(puertas):
+        indices = [i for i, p in enumerate(puertas) if p == puerta]
+        for i, identidad in zip(indices, reconocedor.identificar([rostros[i] for i in indices], puerta)):
+            identidades[i] = identidad
+    identidades = iter(identidades)
+
+    respuestas = []
+    for faces in cajas:
+        if faces is None:
+            respuestas.append({'error': 'imagen JPEG inválida'})
+            continue
+        respuestas.append({'faces': [
+            {'box': [int(v) for v in box], **next(identidades)} for box in faces
+        ]})
+    return respuestas, len(rostros), time.perf_counter() - t0
+
+class Estadisticas:
+    """Latencias por petición y tamaños de lote recientes"""
+
+    def __init__(self, ventana=10000):
+        self.latencias = deque(maxlen=ventana)
+        self.lotes = Counter()
+        self.rostros = 0
+        self.peticiones = 0
+        self.proceso_seconds = 0.0
+        self.inicio = time.perf_counter()
+
+    def registrar_lote(self, n_items, n_rostros, seconds):
+        self.lotes[n_items] += 1
+        self.rostros += n_rostros
+        self.proceso_seconds += seconds
+
+    def registrar_peticion(self, latencia):
+        self.latencias.append(latencia)
+        self.peticiones += 1
+
+    def resumen(self):
+        lat = np.array(self.latencias) * 1000
+        n_lotes = sum(self.lotes.values())
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if len(lat) else (0.0, 0.0, 0.0)
+        return {
+            'requests': self.peticiones,
+            'faces': self.rostros,
+            'uptime_s': round(time.perf_counter() - self.inicio, 1),
+            'latency_ms': {'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2),
+                           'mean': round(float(lat.mean()), 2) if len(lat) else 0.0},
+            'batches': n_lotes,
+            'mean_batch_size': round(sum(k * v for k, v in self.lotes.items()) / max(n_lotes, 1), 2),
+            'batch_sizes': {str(k): v for k, v in sorted(self.lotes.items())},
+            'worker_ms_per_batch': round(self.proceso_seconds * 1000 / max(n_lotes, 1), 2),
+        }
+
+class MicroBatcher:
+    """Agrupa peticiones que llegan con pocos ms de diferencia en un solo lote"""
+
+    def __init__(self, pool, workers, stats, max_batch=16, max_wait_ms=5.0):
+        self.pool = pool
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cola = asyncio.Queue()
+        # Como mucho un lote en vuelo por proceso; el resto se sigue acumulando
+        self.en_vuelo = asyncio.Semaphore(workers)
+
+    async def enviar(self, jpeg, es_recorte, puerta=None):
+        futuro = asyncio.get_running_loop().create_future()
+        await self.cola.put(((jpeg, es_recorte, puerta), futuro))
+        return await futuro
+
+    async def ejecutar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.en_vuelo.acquire()
+            lote = [await self.cola.get()]
+            limite = loop.time() + self.max_wait
+            while len(lote) < self.max_batch:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self.cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            asyncio.create_task(self._despachar(lote))
+
+    async def _despachar(self, lote):
+        items = [item for item, _ in lote]
+        try:
+            respuestas, n_rostros, seconds = await asyncio.get_running_loop().run_in_executor(
+                self.pool, procesar_lote, items)
+            self.stats.registrar_lote(len(items), n_rostros, seconds)
+            for (_, futuro), respuesta in zip(lote, respuestas):
+                futuro.set_result(respuesta)
+        except Exception as e:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+        finally:
+            self.en_vuelo.release()
+
+async def _leer_peticion(reader, max_cuerpo):
+    """Línea de petición, cabeceras y cuerpo de una petición HTTP/1.1 (cuerpo None si excede max_cuerpo)"""
+    linea = await reader.readline()
+    if not linea:
+        return None
+    metodo, destino, _ = linea.decode('latin-1').split(' ', 2)
+    cabeceras = {}
+    while True:
+        linea = await reader.readline()
+        if linea in (b'\r\n', b'\n', b''):
+            break
+        clave, valor = linea.decode('latin-1').split(':', 1)
+        cabeceras[clave.strip().lower()] = valor.strip()
+    longitud = int(cabeceras.get('content-length', 0))
+    if longitud < 0:
+        raise ValueError(f"Content-Length inválido: {longitud}")
+    if longitud > max_cuerpo:
+        # No se lee: la conexión se cierra tras responder 413
+        return metodo, destino, cabeceras, None
+    cuerpo = await reader.readexactly(longitud)
+    return metodo, destino, cabeceras, cuerpo
+
+def _respuesta(estado, datos):
+    cuerpo = json.dumps(datos).encode()
+    texto = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+             500: 'Internal Server Error'}[estado]
+    return (f"HTTP/1.1 {estado} {texto}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n\r\n").encode() + cuerpo
+
+async def atender(batcher, stats, puertas, metodo, destino, cuerpo):
+    """Despachar /identify, /verify y /stats"""
+    url = urlsplit(destino)
+    query = parse_qs(url.query)
+    es_recorte = query.get('crop', ['0'])[0] == '1'
+    puerta = query.get('door', [None])[0]
+
+    if metodo == 'GET' and url.path == '/stats':
+        return 200, stats.resumen()
+    if metodo != 'POST' or url.path not in ('/identify', '/verify'):
+        return 404, {'error': 'ruta desconocida'}
+    if not cuerpo:
+        return 400, {'error': 'se espera una imagen JPEG en el cuerpo'}
+    if url.path == '/verify' and 'name' not in query:
+        return 400, {'error': 'falta el parámetro name'}
+    if puerta is not None and puerta not in puertas:
+        return 400, {'error': f'puerta desconocida en {PUERTAS_PATH}: {puerta}'}
+
+    t0 = time.perf_counter()
+    resultado = await batcher.enviar(cuerpo, es_recorte, puerta)
+    if 'error' in resultado:
+        return 400, resultado
+
+    if url.path == '/verify':
+        nombre = query['name'][0]
+        resultado['verified'] = any(f['accepted'] and f['name'] == nombre for f in resultado['faces'])
+
+    latencia = time.perf_counter() - t0
+    stats.registrar_peticion(latencia)
+    resultado['latency_ms'] = round(latencia * 1000, 2)
+    return 200, resultado
+
+async def servir(host, port, workers, max_batch, max_wait_ms, max_cuerpo_mb=MAX_CUERPO_MB):
+    stats = Estadisticas()
+    puertas = cargar_puertas()
+    max_cuerpo = int(max_cuerpo_mb * 1024 * 1024)
+    # Cada proceso resuelve todas las puertas al cargar su modelo
+    with ProcessPoolExecutor(max_workers=workers, initializer=iniciar_worker,
+                             initargs=(True,)) as pool:
+        # Arrancar todos los procesos ya: fallar al inicio, no en la primera petición
+        # a una puerta mal escrita
+        try:
+            for futuro in [pool.submit(_listo) for _ in range(workers)]:
+                futuro.result()
+        except BrokenProcessPool:
+            print(f"❌ No se pudo cargar el reconocedor (revisa el modelo y {PUERTAS_PATH})")
+            return
+        batcher = MicroBatcher(pool, workers, stats, max_batch, max_wait_ms)
+
+        async def conexion(reader, writer):
+            try:
+                while True:
+                    peticion = await _leer_peticion(reader, max_cuerpo)
+                    if peticion is None:
+                        break
+                    metodo, destino, cabeceras, cuerpo = peticion
+                    if cuerpo is None:
+                        writer.write(_respuesta(413, {'error': f'cuerpo mayor de {max_cuerpo_mb} MB'}))
+                        await writer.drain()
+                        break
+                    try:
+                        estado, datos = await atender(batcher, stats, puertas, metodo, destino,
+                                                      cuerpo)
+                    except Exception as e:
+                        estado, datos = 500, {'error': str(e)}
+                    writer.write(_respuesta(estado, datos))
+                    await writer.drain()
+                    if cabeceras.get('connection', '').lower() == 'close':
+                        break
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                pass
+            finally:
+                writer.close()
+
+        tarea_lotes = asyncio.create_task(batcher.ejecutar())
+        server = await asyncio.start_server(conexion, host, port)
+        print(f"✅ Servicio de verificación en http://{host}:{port} "
+              f"({workers} procesos, lotes de hasta {max_batch}, espera {max_wait_ms} ms)")
+        print("• POST /identify       • POST /verify?name=<persona>       • GET /stats")
+        print("• Añade ?crop=1 si la imagen ya es un recorte del rostro")
+        if puertas:
+            print(f"• Añade ?door=<puerta> para aplicar su lista de {PUERTAS_PATH}: {', '.join(puertas)}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            tarea_lotes.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description='Servicio HTTP de verificación facial')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Procesos de reconocimiento (cada uno carga el modelo)')
+    parser.add_argument('--max-lote', type=int, default=16)
+    parser.add_argument('--espera-ms', type=float, default=5.0,
+                        help='Tiempo máximo para juntar peticiones en un lote')
+    parser.add_argument('--max-cuerpo-mb', type=float, default=MAX_CUERPO_MB,
+                        help='Tamaño máximo de la imagen; las mayores reciben 413')
+    args = parser.parse_args()
+
+    print('🚀 SERVICIO DE VERIFICACIÓN FACIAL')
+    print('='*60)
+    try:
+        asyncio.run(servir(args.host, args.port, args.workers, args.max_lote, args.espera_ms,
+                           args.max_cuerpo_mb))
+    except KeyboardInterrupt:
+        print("\n🛑 Servicio detenido")
+
+if __name__ == "__main__":
+    main()